@@ -1,6 +1,7 @@
 import os
 import shutil
 import subprocess
+from functools import partial
 from pathlib import Path
 
 import cv2
@@ -17,12 +18,23 @@ from classes.ExportDialogs import ExportDialogs
 class Export:
     """
     Class for exporting Save Data and training data in the correct format.
+
+    The public export methods show their settings dialogs and create the export directories, then return the export
+    itself as a callable (or None if cancelled) so that it can be run off the GUI thread.
     """
 
     def __init__(self, scansPath: str):
         self.scansPath = scansPath
-        self.totalPatients = eu.getTotalPatients(self.scansPath)
-        self.patients = [f'{x}' for x in range(1, self.totalPatients + 1)]
+
+    @property
+    def totalPatients(self):
+        """Number of patient folders in scansPath, counted when an export runs rather than at start up."""
+        return eu.getTotalPatients(self.scansPath)
+
+    @property
+    def patients(self):
+        """Patient folder names, see totalPatients."""
+        return [f'{x}' for x in range(1, self.totalPatients + 1)]
 
     @staticmethod
     def openExportDirectory(basedir):
@@ -36,18 +48,22 @@ class Export:
     def exportIPVAUSData(self, scanType, mainWindow: QWidget):
         """Export AUS transverse or sagittal frames for ipv inference."""
         if scanType == Scan.PLANE_TRANSVERSE:
-            self._exportIPVAUSTransverseData(mainWindow)
+            return self._exportIPVAUSTransverseData(mainWindow)
         else:
-            self._exportIPVAUSSagittalData()
+            return self._exportIPVAUSSagittalData()
 
     def exportAllSaveData(self):
         """Export all save data from all patients - For backup."""
         print(f'\tExporting all Save Data from all patients...')
-        scanTypes = ['AUS']
-        scanPlanes = ['Transverse', 'Sagittal']
         savePath = eu.createSaveDataExportDir()
         if not savePath:
             return
+        return partial(self._exportAllSaveDataJob, savePath)
+
+    def _exportAllSaveDataJob(self, savePath: str):
+        """Copy the Save Data of all patients to savePath."""
+        scanTypes = ['AUS']
+        scanPlanes = ['Transverse', 'Sagittal']
         # Loop through patients.
         for patient in self.patients:
             # Loop through scan types within patient.
@@ -82,6 +98,10 @@ class Export:
         # Create export directory.
         imagesPath, labelsPath = eu.createYOLOTrainingDirs(scanPlane, prefix, exportName)
         print(imagesPath)
+        return partial(self._exportYOLOAUSDataJob, scanPlane, prostate, bladder, prefix, imagesPath, labelsPath)
+
+    def _exportYOLOAUSDataJob(self, scanPlane, prostate, bladder, prefix, imagesPath, labelsPath):
+        """Export the frames and YOLO labels of all patients for the settings chosen in exportYOLOAUSData."""
         for patient in self.patients:
             try:
                 print(f'\t\tPatient {patient}...', end=' ')
@@ -159,6 +179,11 @@ class Export:
         # Create directories for AUS training data.
         imagesPath, labelsPath = eu.creatennUAUSTrainingDirs(scanPlane, prefix, exportName)
         print(imagesPath)
+        return partial(self._exportYOLOfornnUNetAUSJob, scanPlane, sp, prostate, bladder, prefix, imagesPath,
+                       labelsPath)
+
+    def _exportYOLOfornnUNetAUSJob(self, scanPlane, sp, prostate, bladder, prefix, imagesPath, labelsPath):
+        """Export the frames and YOLO masks of all patients for the settings chosen in exportYOLOfornnUNetAUS."""
         # Create training data from each patient.
         for patient in self.patients:
             try:
@@ -236,6 +261,11 @@ class Export:
         # Create directories for AUS training data.
         imagesPath, labelsPath = eu.creatennUAUSTrainingDirs(scanPlane, prefix, exportName)
         print(imagesPath)
+        return partial(self._exportnnUNetAUSDataJob, scanPlane, sp, prostate, bladder, prefix, imagesPath,
+                       labelsPath)
+
+    def _exportnnUNetAUSDataJob(self, scanPlane, sp, prostate, bladder, prefix, imagesPath, labelsPath):
+        """Export the frames and masks of all patients for the settings chosen in exportnnUNetAUSData."""
         # Create training data from each patient.
         for patient in self.patients:
             try:
@@ -275,7 +305,11 @@ class Export:
                         pMask = None
                         if prostate and pFrameNumbers is not None and frameNumber in pFrameNumbers:
                             polygon = [[i[1], i[2]] for i in prostatePoints if i[0] == frameNumber]
-                            polygon = [(i[0], i[1]) for i in Utils.distributePoints(polygon, len(polygon))]
+                            try:
+                                polygon = [(i[0], i[1]) for i in Utils.distributePoints(polygon, len(polygon))]
+                            except ValueError as e:
+                                print(f'{e} Frame {frameNumber} skipped (prostate points)...', end=' ')
+                                continue
                             frameShape = pFrames[pFrameNumbers.index(frameNumber)].shape
                             img = Image.new('L', (frameShape[1], frameShape[0]))
                             ImageDraw.Draw(img).polygon(polygon, fill=1)
@@ -283,7 +317,11 @@ class Export:
                         bMask = None
                         if bladder and bFrameNumbers is not None and frameNumber in bFrameNumbers:
                             polygon = [[i[1], i[2]] for i in prostatePoints if i[0] == frameNumber]
-                            polygon = [(i[0], i[1]) for i in Utils.distributePoints(polygon, len(polygon))]
+                            try:
+                                polygon = [(i[0], i[1]) for i in Utils.distributePoints(polygon, len(polygon))]
+                            except ValueError as e:
+                                print(f'{e} Frame {frameNumber} skipped (bladder points)...', end=' ')
+                                continue
                             frameShape = bFrames[bFrameNumbers.index(frameNumber)].shape
                             img = Image.new('L', (frameShape[1], frameShape[0]))
                             ImageDraw.Draw(img).polygon(polygon, fill=2 if pMask is not None else 1)
@@ -316,6 +354,10 @@ class Export:
         prefix, resample, pixelDensity = dlg
         # Create directories for sagittal training data.
         savePath = eu.createIPVTrainingDirs(Scan.PLANE_SAGITTAL)
+        return partial(self._exportIPVAUSSagittalDataJob, prefix, resample, pixelDensity, savePath)
+
+    def _exportIPVAUSSagittalDataJob(self, prefix, resample, pixelDensity, savePath):
+        """Export the sagittal frames and IPV points of all patients for the settings chosen."""
         # Create training data from each patient.
         for patient in self.patients:
             try:
@@ -384,6 +426,10 @@ class Export:
         prefix, resample, pixelDensity = dlg
         # Create directories for sagittal training data.
         savePath = eu.createIPVTrainingDirs(Scan.PLANE_TRANSVERSE)
+        return partial(self._exportIPVAUSTransverseDataJob, prefix, resample, pixelDensity, savePath)
+
+    def _exportIPVAUSTransverseDataJob(self, prefix, resample, pixelDensity, savePath):
+        """Export the transverse frames and IPV points of all patients for the settings chosen."""
         # Create training data from each patient.
         for patient in self.patients:
             try:
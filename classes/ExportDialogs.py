@@ -186,7 +186,7 @@ class ExportDialogs(QDialog):
         layout.addRow(QLabel('Resample Images:'), resampleCB)
         # Resample Pixel Density.
         pixelDensityLE = QLineEdit('4')
-        resampleCB.toggled.connect(lambda: pixelDensityLE.setEnabled(resampleCB.isChecked()))
+        resampleCB.toggled.connect(pixelDensityLE.setEnabled)
         layout.addRow(QLabel('Pixel Density (Pixels/mm):'), pixelDensityLE)
 
         layout.addWidget(buttonBox)
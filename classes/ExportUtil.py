@@ -128,9 +128,10 @@ def getTotalPatients(scansPath: str):
         totalPatients: Total number of patients.
     """
     totalPatients = 0
-    for i in os.listdir(Path(scansPath)):
-        if os.path.isdir(Path(scansPath, i)):
-            totalPatients += 1
+    with os.scandir(Path(scansPath)) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                totalPatients += 1
     return totalPatients
 
 
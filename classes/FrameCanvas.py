@@ -1,11 +1,14 @@
 import math
 
 import matplotlib
+from PyQt6.QtGui import QColor, QFont, QPainter
+from matplotlib import colors, font_manager, patches
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
 
 from classes import Scan
 from classes import ScanUtil as su, Utils
+from classes.ErrorDialog import ErrorDialog
 
 matplotlib.use('Qt5Agg')
 
@@ -37,6 +40,25 @@ class FrameCanvas(FigureCanvasQTAgg):
         self.prostatePoints = prostatePointsCB
         self.bladderPoints = bladderPointsCB
 
+        # Point artists, updated in place on each redraw. Keyed by Scan.PROSTATE or Scan.BLADDER.
+        self.pointLines = {}
+        # Mask polygons and box (rectangle, A and B labels) artists, also updated in place and keyed the same way.
+        self.maskPolygons = {}
+        self.boxArtists = {}
+        # IMU position line, updated in place.
+        self.imuLine = None
+        # Scan detail texts as (x, y, text, colour, rotation) in display coordinates. These are painted with Qt over
+        # the rendered figure (see paintEvent), as rendering them with Matplotlib dominated the cost of a frame.
+        self.overlayTexts = []
+        self.overlayFont = QFont(font_manager.FontProperties().get_name())
+        self.overlayFont.setPixelSize(round(matplotlib.rcParams['font.size'] * 100 / 72))
+        # Bounding box being dragged (Scan.PROSTATE or Scan.BLADDER), drawn by blitting over a saved background.
+        self.dragBox = None
+        self.dragBackground = None
+        self.dragRectangle = None
+        # Empty axis saved after a full draw, frames are then blitted over it. Invalidated on resize or new limits.
+        self.axisBackground = None
+        self.axisBackgroundLimits = None
         # Figure to draw frames on.
         self.fig = Figure(dpi=100)
         self.fig.subplots_adjust(top=1, bottom=0, right=1, left=0, hspace=0, wspace=0)
@@ -44,11 +66,12 @@ class FrameCanvas(FigureCanvasQTAgg):
         self.axis.patch.set_facecolor((0.5, 0.5, 0.5, 1))
         # Canvas functionality.
         self.canvas = self.fig.canvas
-        self.canvas.mpl_connect('button_press_event', lambda x: self._axisPressEvent(x))
-        self.canvas.mpl_connect('motion_notify_event', lambda x: self._axisMotionEvent(x))
-        self.canvas.mpl_connect('button_release_event', lambda x: self._axisReleaseEvent(x))
-        self.canvas.mpl_connect('scroll_event', lambda x: self._axisScrollEvent(x))
-        self.canvas.mpl_connect('figure_leave_event', lambda x: self._axisReleaseEvent(x))
+        self.canvas.mpl_connect('button_press_event', self._axisPressEvent)
+        self.canvas.mpl_connect('motion_notify_event', self._axisMotionEvent)
+        self.canvas.mpl_connect('button_release_event', self._axisReleaseEvent)
+        self.canvas.mpl_connect('scroll_event', self._axisScrollEvent)
+        self.canvas.mpl_connect('figure_leave_event', self._axisReleaseEvent)
+        self.canvas.mpl_connect('resize_event', self._axisResizeEvent)
 
         super(FrameCanvas, self).__init__(self.fig)
 
@@ -71,9 +94,10 @@ class FrameCanvas(FigureCanvasQTAgg):
 
             if self.prostateBoundingBox.isChecked():
                 self.linkedScan.updateBoxPoints(Scan.PROSTATE, Scan.BOX_DRAW, dp)
+                self._blitDragBox(Scan.PROSTATE, self.showProstateBox.isChecked(), 'lime')
             elif self.bladderBoundingBox.isChecked():
                 self.linkedScan.updateBoxPoints(Scan.BLADDER, Scan.BOX_DRAW, dp)
-            self.updateDisplay()
+                self._blitDragBox(Scan.BLADDER, self.showBladderBox.isChecked(), 'dodgerblue')
 
     def _axisReleaseEvent(self, event):
         """Handle left releases on axis 1 and 2."""
@@ -84,13 +108,15 @@ class FrameCanvas(FigureCanvasQTAgg):
                     if self.prostatePoints.isChecked() and dp[0] is not None:
                         self.linkedScan.addOrRemovePoint(dp, Scan.PROSTATE)
                     elif self.bladderPoints.isChecked() and dp[0] is not None:
-                        self.linkedScan.addOrRemovePoint(dp, Scan.BLADDER)
+                        # Bladder points are removed within a smaller radius.
+                        self.linkedScan.addOrRemovePoint(dp, Scan.BLADDER, 5)
             elif self.prostateBoundingBox.isChecked():
                 if event.button == 1:
                     self.linkedScan.updateBoxPoints(Scan.PROSTATE, Scan.BOX_END, dp)
             elif self.bladderBoundingBox.isChecked():
                 if event.button == 1:
                     self.linkedScan.updateBoxPoints(Scan.BLADDER, Scan.BOX_END, dp)
+            self._endDragBox()
             self.updateDisplay()
 
         self.startDrag = False
@@ -105,35 +131,145 @@ class FrameCanvas(FigureCanvasQTAgg):
                 self.linkedScan.navigate(Scan.NAVIGATION['s'])
             self.updateDisplay()
 
+    def paintEvent(self, event):
+        """Paint the rendered figure, then the scan detail texts over it."""
+        super().paintEvent(event)
+        if not self.overlayTexts or self.linkedScan is None:
+            return
+        painter = QPainter(self)
+        painter.setFont(self.overlayFont)
+        ratio = self.device_pixel_ratio
+        height = self.figure.bbox.height
+        # Texts follow the axis (e.g. when zoomed), display coordinates are mapped to widget coordinates.
+        positions = self.axis.transData.transform([(x, y) for x, y, *_ in self.overlayTexts])
+        for (px, py), (_, _, text, colour, rotation) in zip(positions, self.overlayTexts):
+            painter.save()
+            painter.setPen(QColor(colors.to_hex(colour)))
+            painter.translate(px / ratio, (height - py) / ratio)
+            painter.rotate(-rotation)
+            painter.drawText(0, 0, text)
+            painter.restore()
+        painter.end()
+
+    def print_figure(self, *args, **kwargs):
+        """
+        Save the figure (e.g. from the toolbar). The scan detail texts are only painted by Qt, so they are added to the
+        axis as text artists for the duration of the save.
+        """
+        texts = [self.axis.text(x, y, text, color=colour, rotation=rotation)
+                 for x, y, text, colour, rotation in self.overlayTexts]
+        try:
+            return super().print_figure(*args, **kwargs)
+        finally:
+            for text in texts:
+                text.remove()
+            # Saving renders the figure again, possibly at another size, so the saved axis background is redone.
+            self.axisBackground = None
+            self.draw_idle()
+
+    def _axisResizeEvent(self, event):
+        """The saved axis background no longer matches the canvas after a resize."""
+        self.axisBackground = None
+
+    def _blitDragBox(self, prostateBladder, showBox: bool, colour):
+        """
+        Draw the bounding box being dragged without redrawing the whole canvas. On the first call of a drag the
+        canvas is drawn once without this box and saved as the background, after which only the box is drawn over the
+        background and blitted.
+
+        Args:
+            prostateBladder: Box being dragged, PROSTATE or BLADDER.
+            showBox: Is the box shown on the canvas.
+            colour: Colour of box.
+        """
+        if not showBox:
+            return
+        if self.dragBox != prostateBladder:
+            self.dragBox = prostateBladder
+            self.dragRectangle = patches.Rectangle((0, 0), 0, 0, linewidth=1, edgecolor=colour, facecolor='none',
+                                                   animated=True)
+            # Draws the canvas without the dragged box and saves the background.
+            self.updateAxis(False)
+        if self.dragRectangle not in self.axis.patches:
+            self.axis.add_patch(self.dragRectangle)
+
+        points = self.linkedScan.getBoxPointsOnFrame(prostateBladder)
+        if len(points) < 4:
+            return
+        fd = self.linkedScan.frameShape
+        dd = self.linkedScan.displayDimensions
+        start = su.pixelsToDisplay(points[:2], fd, dd)
+        end = su.pixelsToDisplay(points[2:], fd, dd)
+        self.dragRectangle.set_xy(start)
+        self.dragRectangle.set_width(end[0] - start[0])
+        self.dragRectangle.set_height(end[1] - start[1])
+
+        self.restore_region(self.dragBackground)
+        self.axis.draw_artist(self.dragRectangle)
+        self.blit(self.axis.bbox)
+
+    def _endDragBox(self):
+        """Remove the blitted drag box, the full box is drawn by the next redraw."""
+        if self.dragRectangle is not None and self.dragRectangle in self.axis.patches:
+            self.dragRectangle.remove()
+        self.dragBox = None
+        self.dragBackground = None
+        self.dragRectangle = None
+
+    def persistentArtists(self):
+        """Return the artists updated in place, these must not be removed between frames."""
+        boxArtists = [artist for artists in self.boxArtists.values() for artist in artists]
+        return [*self.pointLines.values(), *self.maskPolygons.values(), *boxArtists,
+                *([self.imuLine] if self.imuLine else []),
+                *([self.dragRectangle] if self.dragRectangle is not None else [])]
+
     def updateAxis(self, new):
         """Update axis with frame and points."""
         if not new:
             xLimits = self.axis.get_xlim()
             yLimits = self.axis.get_ylim()
-        self.linkedScan.drawFrameOnAxis(self)
+        self.linkedScan.drawFrameOnAxis(self, new)
 
-        # self.background = self.copy_from_bbox(self.axis.bbox)
         cfi = self.linkedScan.currentFrame - 1
-        fd = self.linkedScan.frames[cfi].shape
+        fd = self.linkedScan.frameShape
         dd = self.linkedScan.displayDimensions
-        # Draw prostate points on canvas if box ticked.
-        if self.showProstatePoints.isChecked():
-            su.drawPointDataOnAxis(self.axis, self.linkedScan.getPointsOnFrame(Scan.PROSTATE), fd, dd, 'lime')
-        # Draw bladder points on canvas if box ticked.
-        if self.showBladderPoints.isChecked():
-            su.drawPointDataOnAxis(self.axis, self.linkedScan.getPointsOnFrame(Scan.BLADDER), fd, dd, 'dodgerblue')
-        # Draw prostate mask on canvas if box ticked.
-        if self.showProstateMask.isChecked():
-            su.drawMaskOnAxis(self.axis, self.linkedScan.getPointsOnFrame(Scan.PROSTATE), fd, dd, 'lime')
-        # Draw bladder mask on canvas if box ticked.
-        if self.showBladderMask.isChecked():
-            su.drawMaskOnAxis(self.axis, self.linkedScan.getPointsOnFrame(Scan.BLADDER), fd, dd, 'dodgerblue')
-        # Draw prostate box on canvas if box ticked.
-        if self.showProstateBox.isChecked():
-            su.drawBoxOnAxis(self.axis, self.linkedScan.getBoxPointsOnFrame(Scan.PROSTATE), fd, dd, 'lime')
-        # Draw bladder box on canvas if box ticked.
-        if self.showBladderBox.isChecked():
-            su.drawBoxOnAxis(self.axis, self.linkedScan.getBoxPointsOnFrame(Scan.BLADDER), fd, dd, 'dodgerblue')
+        # Points on the current frame, fetched once and shared by the point and mask overlays.
+        prostatePoints = self.linkedScan.getPointsOnFrame(Scan.PROSTATE) \
+            if self.showProstatePoints.isChecked() or self.showProstateMask.isChecked() else []
+        bladderPoints = self.linkedScan.getPointsOnFrame(Scan.BLADDER) \
+            if self.showBladderPoints.isChecked() or self.showBladderMask.isChecked() else []
+        # Draw prostate and bladder points on canvas if box ticked, reusing the point artists.
+        pointData = [(Scan.PROSTATE, self.showProstatePoints, prostatePoints, 'lime'),
+                     (Scan.BLADDER, self.showBladderPoints, bladderPoints, 'dodgerblue')]
+        for prostateBladder, showPoints, points, colour in pointData:
+            if showPoints.isChecked():
+                self.pointLines[prostateBladder] = su.drawPointDataOnAxis(self.axis, points, fd, dd, colour,
+                                                                          self.pointLines.get(prostateBladder))
+            elif prostateBladder in self.pointLines:
+                self.pointLines[prostateBladder].set_visible(False)
+        # Draw prostate and bladder masks on canvas if box ticked, reusing the mask artists.
+        maskData = [(Scan.PROSTATE, self.showProstateMask, prostatePoints, 'lime'),
+                    (Scan.BLADDER, self.showBladderMask, bladderPoints, 'dodgerblue')]
+        for prostateBladder, showMask, points, colour in maskData:
+            polygon = self.maskPolygons.get(prostateBladder)
+            if showMask.isChecked():
+                polygon = su.drawMaskOnAxis(self.axis, points, fd, dd, colour, polygon)
+                if polygon is not None:
+                    self.maskPolygons[prostateBladder] = polygon
+            elif polygon is not None:
+                polygon.set_visible(False)
+        # Draw prostate and bladder boxes on canvas if box ticked (and not being dragged), reusing the box artists.
+        boxData = [(Scan.PROSTATE, self.showProstateBox, 'lime'), (Scan.BLADDER, self.showBladderBox, 'dodgerblue')]
+        for prostateBladder, showBox, colour in boxData:
+            artists = self.boxArtists.get(prostateBladder)
+            if showBox.isChecked() and self.dragBox != prostateBladder:
+                artists = su.drawBoxOnAxis(self.axis, self.linkedScan.getBoxPointsOnFrame(prostateBladder), fd, dd,
+                                           colour, artists)
+                if artists is not None:
+                    self.boxArtists[prostateBladder] = artists
+            elif artists is not None:
+                for artist in artists:
+                    artist.set_visible(False)
         # Draw Bullet data on canvas if box is ticked.
         su.drawBulletDataOnAxis(self.axis, self.linkedScan.frameNames[cfi], self.linkedScan.bulletData, fd, dd)
 
@@ -141,7 +277,38 @@ class FrameCanvas(FigureCanvasQTAgg):
             self.axis.set_xlim(xLimits)
             self.axis.set_ylim(yLimits)
 
-        self.draw()
+        if self.dragBox is not None:
+            self.draw()
+            # Background for the box being dragged, animated artists are not included in draw.
+            self.dragBackground = self.copy_from_bbox(self.axis.bbox)
+        else:
+            self._blitAxis(new)
+
+    def _blitAxis(self, new):
+        """
+        Draw the frame and overlays over the saved empty axis background and blit the axis, instead of drawing the
+        whole figure. The background is saved with a full draw (overlays hidden) when there is none, when a new frame
+        shape is shown, or when the axis limits have changed.
+
+        Args:
+            new: Was the axis cleared for this frame.
+        """
+        artists = [artist for artist in [*self.axis.images, *self.axis.lines, *self.axis.patches, *self.axis.texts,
+                                         *self.axis.collections] if artist.get_visible() and not artist.get_animated()]
+        limits = (self.axis.get_xlim(), self.axis.get_ylim())
+        if new or self.axisBackground is None or limits != self.axisBackgroundLimits:
+            for artist in artists:
+                artist.set_visible(False)
+            self.draw()
+            self.axisBackground = self.copy_from_bbox(self.axis.bbox)
+            self.axisBackgroundLimits = limits
+            for artist in artists:
+                artist.set_visible(True)
+
+        self.restore_region(self.axisBackground)
+        for artist in sorted(artists, key=lambda a: a.get_zorder()):
+            self.axis.draw_artist(artist)
+        self.blit(self.axis.bbox)
 
     def distributeFramePoints(self, count: int, prostateBladder):
         """
@@ -156,12 +323,15 @@ class FrameCanvas(FigureCanvasQTAgg):
         if len(pointsPix) == 0 or prostateBladder not in [Scan.PROSTATE, Scan.BLADDER]:
             return
 
+        try:
+            endPointsPix = Utils.distributePoints(pointsPix, count)
+        except ValueError as e:
+            ErrorDialog(None, 'Error interpolating points (too few, must be > 2).', e)
+            return
+
         # Clear current points from frame.
         self.linkedScan.clearFramePoints(prostateBladder)
-        fd = self.linkedScan.frames[self.linkedScan.currentFrame - 1].shape
-
-        endPointsPix = Utils.distributePoints(pointsPix, count)
-        # Save points.
-        for pointPix in endPointsPix:
-            pointDisplay = su.pixelsToDisplay([pointPix[0], pointPix[1]], fd, self.linkedScan.displayDimensions)
+        fd = self.linkedScan.frameShape
+        # Save points, converted to display coordinates all at once.
+        for pointDisplay in su.pixelsToDisplayArray(endPointsPix, fd, self.linkedScan.displayDimensions):
             self.linkedScan.addOrRemovePoint(pointDisplay, prostateBladder, 0)
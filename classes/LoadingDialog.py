@@ -17,7 +17,7 @@ class LoadingDialog(QDialog):
         labelAnimation = QLabel(self)
         labelAnimation.setStyleSheet('border:none')
 
-        self.movie = QMovie(f'{basedir}/resources/loading.gif')
+        self.movie = QMovie(f'{basedir}/res/loading.gif')
         self.movie.setScaledSize(QSize(200, 200))
         labelAnimation.setMovie(self.movie)
 
@@ -30,6 +30,15 @@ class LoadingDialog(QDialog):
         self.movie.start()
         self.exec()
 
+    def startNonBlocking(self):
+        """
+        Show the dialog without blocking, for tasks running on a background thread. The dialog is still modal, so the
+        rest of the application cannot be used (e.g. to edit the data being worked on) until it is stopped.
+        """
+        self.setWindowModality(Qt.WindowModality.ApplicationModal)
+        self.movie.start()
+        self.show()
+
     def stop(self):
         self.movie.stop()
         self.close()
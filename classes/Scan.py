@@ -1,16 +1,17 @@
 # Scan.py
 
 """Scan class with variables and methods for working with a single scan."""
-import json
 import shutil
 import subprocess
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-import cv2
 import numpy as np
+from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import QMainWindow
-from pyquaternion import Quaternion
 
 from classes import FrameCanvas, Utils
 from classes import ScanUtil as su
@@ -38,6 +39,8 @@ SAVE_POINT_DATA = '-SAVE-POINT-DATA-'
 SAVE_BULLET_DATA = '-SAVE-PLANE-DATA-'
 SAVE_IPV_DATA = '-SAVE-IPV-DATA-'
 SAVE_ALL = '-SAVE-ALL-'
+# Delay (ms) before changed data is written to disk, so bursts of changes are written once.
+SAVE_DELAY = 250
 # Copy points from previous or next frame.
 NEXT = '-NEXT-'
 PREVIOUS = '-PREVIOUS-'
@@ -53,6 +56,11 @@ BLADDER_BOX = '-BLADDER-BOX-'
 BOX_START = '-START-'
 BOX_DRAW = '-DRAW-'
 BOX_END = '-END-'
+# Number of resized display frames kept in the display frame cache.
+DISPLAY_CACHE_SIZE = 8
+# Number of display frames prefetched ahead of (in the direction of the last navigation) and behind the current frame.
+PREFETCH_AHEAD = 4
+PREFETCH_BEHIND = 1
 
 
 class Scan:
@@ -68,14 +76,17 @@ class Scan:
         self.window = window
         # Path to Recording directory.
         self.path = None
-        # Recording frames, stored in working memory.
+        # Recording frames, stored in shared memory so other processes (PlayCine) can view them without copying.
         self.frames = None
+        self.framesShm = None
         # Shape of frames, assumed equal for all frames.
         self.frameShape = None
         # Total number of frames.
         self.frameCount = None
         # Current frame being displayed.
         self.currentFrame = None
+        # Direction of the last step through the frames (1 or -1), prefetching favours this direction.
+        self.navigationDirection = 1
         # IMU data.txt file information.
         self.frameNames, self.accelerations, self.quaternions, self.depths, self.duration = None, None, None, None, None
         # EditingData.txt file information.
@@ -86,66 +97,224 @@ class Scan:
         self.displayDimensions = None
         # Point data from PointData.json.
         self.pointPath, self.pointsProstate, self.pointsBladder, self.boxProstate, self.boxBladder = None, None, None, None, None
+        # Row indices of each organ's points and boxes grouped by frame name,
+        # {PROSTATE/BLADDER/PROSTATE_BOX/BLADDER_BOX: {frameName: [index, ...]}}. Built when first needed and cleared
+        # whenever the point data changes (see _pointsChanged), appended rows are added in place.
+        self.framePointsIndex = {}
         # IPV data from IPV.JSON.
         self.ipvPath, self.ipvData = None, None
         # Bullet data from Bullet.json
         self.bulletPath, self.bulletData = None, None
+        # Cached scan details, axis angles, and start/end indices of the sweep, cleared when the data files are
+        # (re)loaded.
+        self.scanDetails, self.axisAngles, self.slopeStartEnd = None, None, None
+        # TS1 centre frame name (None if there is no TS1 save data) with the Scan path and Save Data modification time
+        # it was found for, save data is never edited so it only changes when save folders are added or removed.
+        self.ts1Centre = None
+        # Frames resized to the display dimensions (with corner markers), most recently used last. Neighbouring
+        # frames are added from a background thread, so access (and releasing the frames) is guarded by a lock.
+        self.displayFrames = OrderedDict()
+        self.displayFramesLock = threading.RLock()
+        # Data types changed since they were last written to disk, and the timer that writes them (see flush). The timer
+        # is created on the first change, so a Scan can be created without a running event loop.
+        self.unsavedTypes = set()
+        self.saveTimer = None
         # Has a Scan been loaded?
         self.loaded = False
 
-    def load(self, path: str, startingFrame=1):
+    def load(self, path: str, startingFrame=1, frames=None, framesShm=None, displayFrames=None, imuData=None):
         """
         Load a Scan object using the given path string. See __init__ for attribute details.
 
         Args:
             path: Path to Scan directory as a String.
             startingFrame: Starting frame position.
+            frames: Frames already loaded from path (e.g. by a ScanLoader), if None they are loaded here.
+            framesShm: Shared memory block backing frames, the Scan takes ownership of it.
+            displayFrames: Frames already resized for display by the loader (see ScanLoader), as {index: (dd, frame)}.
+            imuData: IMU data already read from path by the loader (see su.getIMUDataFromFile), read here if None.
         """
         print(f'Loading {path}...')
-        self.frames = su.loadFrames(path)
+        # Changes to the previous scan are written to its own files.
+        self.flush()
         self.path = path
+        self._loadFrames(frames, framesShm)
+        self.currentFrame = startingFrame if startingFrame < self.frameCount else 1
+        self._loadMetadata(imuData)
+        self._loadSaveFiles()
+        # Seed the display frame cache, unless the window was resized while loading.
+        with self.displayFramesLock:
+            for index, (dd, frame) in (displayFrames or {}).items():
+                if dd == self.displayDimensions:
+                    self.displayFrames[index] = frame
+        self.loaded = True
+        print(f'{path} loaded.')
+
+    def reload(self):
+        """
+        Reload the Scan data files (IMU, editing, point, IPV, and bullet data) from disk without decoding the frames
+        again. Used after save data has been loaded or when the data files have been edited (or reset) externally, so
+        changes not yet written to disk are discarded rather than written over the files.
+        """
+        print(f'Reloading {self.path} data...')
+        self.discardUnsaved()
+        self._loadMetadata()
+        self._loadSaveFiles()
+        print(f'{self.path} data reloaded.')
+
+    def _loadFrames(self, frames=None, framesShm=None):
+        """Load the frames stored in self.path (unless already given) and set the frame shape and count."""
+        if frames is not None:
+            self.releaseFrames()
+            self.framesShm, self.frames = framesShm, frames
+        else:
+            self.frames = su.loadFrames(self.path, allocate=self._allocateSharedFrames)
         self.frameShape = self.frames[0].shape
         self.frameCount = len(self.frames)
-        self.currentFrame = startingFrame if startingFrame < self.frameCount else 1
-        self.frameNames, self.accelerations, self.quaternions, self.depths, self.duration = su.getIMUDataFromFile(
-            self.path)
+
+    def _loadMetadata(self, imuData=None):
+        """Load IMU data (unless already given) and editing data, and set the scan details and display dimensions."""
+        if imuData is None:
+            imuData = su.getIMUDataFromFile(self.path)
+        self.frameNames, self.accelerations, self.quaternions, self.depths, self.duration = imuData
         self.editPath, self.imuOffset, self.imuPosition = su.getEditDataFromFile(self.path)
+        self.scanDetails, self.axisAngles, self.slopeStartEnd = None, None, None
         _, self.scanType, self.scanPlane, _, _ = self.getScanDetails()
         self.displayDimensions = self.getDisplayDimensions()
+        self.clearDisplayFrames()
+
+    def _loadSaveFiles(self):
+        """Load point data, IPV data, and bullet data."""
         self.pointPath, self.pointsProstate, self.pointsBladder, self.boxProstate, self.boxBladder = su.getPointDataFromFile(
             self.path)
+        self._pointsChanged()
         self.ipvPath, self.ipvData = su.getIPVDataFromFile(self.path)
         self.bulletPath, self.bulletData = su.getBulletDataFromFile(self.path)
-        self.loaded = True
-        print(f'{path} loaded.')
 
-    def drawFrameOnAxis(self, canvas: FrameCanvas):
+    def _allocateSharedFrames(self, shape: tuple, dtype) -> np.ndarray:
+        """
+        Release any previously held frames and allocate a shared memory block for the frames to be decoded into.
+
+        Args:
+            shape: Shape of the stacked frames.
+            dtype: Type of the frames.
+
+        Returns:
+            ndarray view of the block, backed by self.framesShm.
+        """
+        self.releaseFrames()
+        self.framesShm, frames = su.createSharedFrames(shape, dtype)
+        return frames
+
+    def releaseFrames(self):
+        """Release the shared memory block holding the frames (if one exists)."""
+        with self.displayFramesLock:
+            self.frames = None
+            self.displayFrames.clear()
+            if self.framesShm is not None:
+                self.framesShm.close()
+                self.framesShm.unlink()
+                self.framesShm = None
+
+    def __del__(self):
+        """Make sure the shared memory block is not left behind if the Scan is discarded without releasing it."""
+        try:
+            self.releaseFrames()
+        except Exception as e:
+            print(f'Error releasing frames: {e}.')
+
+    def getSharedFramesDetails(self):
+        """
+        Return the details needed to attach to the shared frames from another process.
+
+        Returns:
+            Shared memory block name, frames shape, and frames dtype.
+        """
+        return self.framesShm.name, self.frames.shape, self.frames.dtype.str
+
+    def clearDisplayFrames(self):
+        """Clear the display frame cache, required when the frames or display dimensions change."""
+        with self.displayFramesLock:
+            self.displayFrames.clear()
+
+    def getDisplayFrame(self, index: int) -> np.ndarray:
+        """
+        Return the frame at index resized to the display dimensions with corner markers drawn on. Frames are cached
+        (DISPLAY_CACHE_SIZE most recently used), the returned array must not be modified or kept, and must only be used
+        while displayFramesLock is held, as it is reused once evicted (AxesImage.set_data copies it).
+
+        Args:
+            index: Index of frame.
+
+        Returns:
+            Display frame.
+        """
+        # The lock is held while resizing so the frames cannot be released by another thread mid resize.
+        with self.displayFramesLock:
+            if index not in self.displayFrames:
+                # The least recently used frame is evicted first, its array is reused for the resized frame.
+                dst = None
+                while len(self.displayFrames) >= DISPLAY_CACHE_SIZE:
+                    _, dst = self.displayFrames.popitem(last=False)
+                self.displayFrames[index] = su.resizeFrameForDisplay(self.frames[index], self.displayDimensions, dst)
+            self.displayFrames.move_to_end(index)
+            return self.displayFrames[index]
+
+    def prefetchDisplayFrames(self):
+        """
+        Resize the PREFETCH_AHEAD frames in the direction of the last navigation and the PREFETCH_BEHIND frames in the
+        other direction (wrapping around, as navigation does) into the display frame cache. Intended to be run on a
+        background thread after navigating.
+        """
+        cfi = self.currentFrame - 1
+        for offset in self._prefetchOffsets():
+            with self.displayFramesLock:
+                # The frames may have been released or replaced since the prefetch was started.
+                if self.frames is None or self.frameCount != len(self.frames):
+                    return
+                self.getDisplayFrame((cfi + offset) % self.frameCount)
+
+    def displayFramesPrefetched(self) -> bool:
+        """Return True if the frames prefetchDisplayFrames would resize are all in the display frame cache already."""
+        with self.displayFramesLock:
+            if self.frames is None:
+                return True
+            cfi = self.currentFrame - 1
+            return all((cfi + offset) % self.frameCount in self.displayFrames for offset in self._prefetchOffsets())
+
+    def _prefetchOffsets(self):
+        """Offsets from the current frame of the frames to prefetch, in the order they are prefetched."""
+        step = self.navigationDirection
+        return [step * d for d in range(1, PREFETCH_AHEAD + 1)] + [-step * d for d in range(1, PREFETCH_BEHIND + 1)]
+
+    def drawFrameOnAxis(self, canvas: FrameCanvas, new=False):
         """
         Draw the current frame on the provided canvas with all Scan details drawn on.
 
         Args:
             canvas: Canvas to draw frame on.
+            new: If True, the axis is cleared and its limits reset before drawing.
         """
         axis = canvas.axis
         cfi = self.currentFrame - 1
-        frame = self.frames[cfi].copy()
         count = self.frameCount
         depths = self.depths[cfi]
         imuOffset = self.imuOffset
         imuPosition = self.imuPosition
         dd = self.displayDimensions
-        # Resize frame to fit display dimensions.
-        frame = cv2.resize(frame, dd, cv2.INTER_CUBIC)
-        # Corner markers.
-        frame[-1][-1], frame[-1][0], frame[0][-1], frame[0][0] = 255, 255, 255, 255
-        # Prepare axis and draw frame.
-        su.drawFrameOnAxis(axis, frame)
+        # Prepare axis and draw frame. The lock is held until the image has copied the frame, as a prefetch on another
+        # thread may otherwise evict the cached array and resize another frame into it.
+        with self.displayFramesLock:
+            # Frame resized to fit display dimensions, usually already prefetched.
+            frame = self.getDisplayFrame(cfi)
+            su.drawFrameOnAxis(axis, frame, new, keep=canvas.persistentArtists())
         # Draw scan details on axis.
-        su.drawScanDataOnAxis(axis, frameNumber=cfi + 1, frameCount=count, depths=depths, imuOff=imuOffset,
-                              imuPos=imuPosition, dd=dd, frameProstatePoints=self.countFramePoints(PROSTATE),
-                              frameBladderPoints=self.countFramePoints(BLADDER),
-                              totalProstatePoints=len(self.pointsProstate), totalProstateBoxes=len(self.boxProstate),
-                              totalBladderPoints=len(self.pointsBladder), totalBladderBoxes=len(self.boxBladder))
+        canvas.imuLine = su.drawIMUPositionOnAxis(axis, imuPosition, dd, canvas.imuLine)
+        canvas.overlayTexts = su.getScanDataTexts(
+            frameNumber=cfi + 1, frameCount=count, depths=depths, imuOff=imuOffset, imuPos=imuPosition, dd=dd,
+            frameProstatePoints=self.countFramePoints(PROSTATE), frameBladderPoints=self.countFramePoints(BLADDER),
+            totalProstatePoints=len(self.pointsProstate), totalProstateBoxes=len(self.boxProstate),
+            totalBladderPoints=len(self.pointsBladder), totalBladderBoxes=len(self.boxBladder))
 
     def getBoxPointsOnFrame(self, prostateBladder, position=None):
         """
@@ -158,14 +327,10 @@ class Scan:
         """
         points = []
         frameName = self.frameNames[position if position is not None else self.currentFrame - 1]
-        if prostateBladder == PROSTATE:
-            boxIndex = su.getIndexOfFrameInBoxPoints(self.boxProstate, frameName)
-            if boxIndex > -1:
-                points = self.boxProstate[boxIndex][1:]
-        else:
-            boxIndex = su.getIndexOfFrameInBoxPoints(self.boxBladder, frameName)
-            if boxIndex > -1:
-                points = self.boxBladder[boxIndex][1:]
+        boxes = self.boxProstate if prostateBladder == PROSTATE else self.boxBladder
+        boxIndex = self._getFrameBoxIndex(prostateBladder, frameName)
+        if boxIndex > -1:
+            points = boxes[boxIndex][1:]
         return points
 
     def getPointsOnFrame(self, prostateBladder, position=None):
@@ -176,19 +341,75 @@ class Scan:
         :param position: Index of frame.
         :return: List of points on frame.
         """
-        if prostateBladder == PROSTATE:
-            if position is not None:
-                points = [p[1:] for p in self.pointsProstate if p[0] == self.frameNames[position]]
-            else:
-                points = [p[1:] for p in self.pointsProstate if p[0] == self.frameNames[self.currentFrame - 1]]
-        else:
-            if position is not None:
-                points = [p[1:] for p in self.pointsBladder if p[0] == self.frameNames[position]]
-            else:
-                points = [p[1:] for p in self.pointsBladder if p[0] == self.frameNames[self.currentFrame - 1]]
+        frameName = self.frameNames[self.currentFrame - 1 if position is None else position]
+        allPoints = self.pointsProstate if prostateBladder == PROSTATE else self.pointsBladder
+        points = [allPoints[i][1:] for i in self._getFramePointIndices(prostateBladder, frameName)]
 
         return points
 
+    def _getFramePointIndices(self, prostateBladder, frameName) -> list:
+        """
+        Return the indices of the prostate or bladder point rows ([frameName, x, y]) on the named frame, from the frame
+        index (built on first use after the points change) rather than searching all points. Do not modify the list.
+
+        Args:
+            prostateBladder: Get either prostate or bladder rows.
+            frameName: Name of frame.
+
+        Returns:
+            List of indices of point rows on frame.
+        """
+        index = self.framePointsIndex.get(prostateBladder)
+        if index is None:
+            index = {}
+            for i, row in enumerate(self.pointsProstate if prostateBladder == PROSTATE else self.pointsBladder):
+                index.setdefault(row[0], []).append(i)
+            self.framePointsIndex[prostateBladder] = index
+        return index.get(frameName, [])
+
+    def _getFrameBoxIndices(self, prostateBladder, frameName) -> list:
+        """
+        Return the indices of the prostate or bladder box rows of the named frame, from the frame index (built on first
+        use after the boxes change) rather than searching all boxes. A frame has one box, but older or hand edited
+        files can hold more. Do not modify the list.
+
+        Args:
+            prostateBladder: Get either prostate or bladder boxes.
+            frameName: Name of frame.
+
+        Returns:
+            List of indices of box rows on frame.
+        """
+        key = PROSTATE_BOX if prostateBladder == PROSTATE else BLADDER_BOX
+        index = self.framePointsIndex.get(key)
+        if index is None:
+            index = {}
+            for i, row in enumerate(self.boxProstate if prostateBladder == PROSTATE else self.boxBladder):
+                index.setdefault(row[0], []).append(i)
+            self.framePointsIndex[key] = index
+        return index.get(frameName, [])
+
+    def _getFrameBoxIndex(self, prostateBladder, frameName) -> int:
+        """
+        Return the index of the (first) prostate or bladder box row of the named frame, see _getFrameBoxIndices.
+
+        Args:
+            prostateBladder: Get either prostate or bladder box.
+            frameName: Name of frame.
+
+        Returns:
+            Index of the frame's box row, or -1 if the frame has no box.
+        """
+        indices = self._getFrameBoxIndices(prostateBladder, frameName)
+        return indices[0] if indices else -1
+
+    def _pointsChanged(self):
+        """
+        Clear the frame index of the points and boxes, must be called whenever points are added, removed, or replaced,
+        and whenever boxes are added or removed, unless the row is appended and added to the index in place.
+        """
+        self.framePointsIndex = {}
+
     def navigate(self, navCommand):
         """
         Navigate through the frames according to the navCommand parameter.
@@ -197,24 +418,17 @@ class Scan:
         """
         # Navigate.
         try:
-            goToFrame = int(navCommand)
-            if self.frameCount >= goToFrame > 0:
-                self.currentFrame = goToFrame
-            elif goToFrame > self.frameCount:
-                self.currentFrame = self.frameCount
-            elif goToFrame < 1:
-                self.currentFrame = 1
+            # Frame indices are clamped to the first/last frame.
+            self.currentFrame = min(max(int(navCommand), 1), self.frameCount)
         except ValueError:
             if navCommand == NAVIGATION['w']:
-                self.currentFrame += 1
-            elif navCommand in NAVIGATION['s']:
-                self.currentFrame -= 1
-
-        # If the frame position goes beyond max or min, cycle around.
-        if self.currentFrame <= 0:
-            self.currentFrame = self.frameCount + self.currentFrame
-        elif self.currentFrame > self.frameCount:
-            self.currentFrame = self.currentFrame - self.frameCount
+                self.navigationDirection = 1
+            elif navCommand == NAVIGATION['s']:
+                self.navigationDirection = -1
+            else:
+                return
+            # Stepping beyond the first or last frame cycles around.
+            self.currentFrame = (self.currentFrame - 1 + self.navigationDirection) % self.frameCount + 1
 
     def getDisplayDimensions(self):
         """
@@ -225,17 +439,7 @@ class Scan:
         :return: displayDimensions : Size of the canvas that will be used to display the frame.
         """
         if self.window:
-            windowDimensions = [self.window.centralWidget().size().width(), self.window.centralWidget().size().height]
-
-            width = windowDimensions[0] * 0.48  # Width of frame is 48% of total screen width.
-
-            ratio = width / self.frames[0].shape[1]
-
-            height = self.frames[0].shape[0] * ratio  # Maintain aspect ratio of frame.
-
-            displayDimensions = [int(width), int(height)]
-
-            return displayDimensions
+            return su.getDisplayDimensions(self.window.centralWidget().size().width(), self.frameShape)
         return None
 
     def getScanDetails(self):
@@ -244,21 +448,19 @@ class Scan:
 
         :return: patient, scanType, scanPlane, frameCount.
         """
-        path = self.path.split('/')
-        patient = path[-4]
-        scanType = path[-3]
-        scanPlane = path[-2].lower().capitalize()
-        scanNumber = path[-1]
+        if self.scanDetails is None:
+            patient, scanType, scanPlane, scanNumber = Path(self.path).parts[-4:]
+            scanPlane = scanPlane.capitalize()
+            self.scanDetails = (patient, scanType, scanPlane, scanNumber, self.frameCount)
 
-        return patient, scanType, scanPlane, scanNumber, self.frameCount
+        return self.scanDetails
 
     def openDirectory(self):
         """
         Open Windows Explorer at the Scan directory.
         """
-        path = self.path.replace('/', '\\')
         try:
-            subprocess.Popen(f'explorer "{path}"')
+            subprocess.Popen(['explorer', str(Path(self.path))])
         except Exception as e:
             ErrorDialog(None, f'Error opening Windows explorer.', e)
 
@@ -274,76 +476,96 @@ class Scan:
         startDrawEnd: Start point, draw point, or end point of the bounding box.
         pointDisplay: Point coordinates in display coordinates.
         """
-        pointPixel = su.displayToPixels(pointDisplay, self.frames[self.currentFrame - 1].shape, self.displayDimensions)
+        pointPixel = su.displayToPixels(pointDisplay, self.frameShape, self.displayDimensions)
         frameName = self.frameNames[self.currentFrame - 1]
-        if prostateBladder == PROSTATE:
-            index = su.getIndexOfFrameInBoxPoints(self.boxProstate, frameName)
-            if index > -1:
-                if startDrawEnd == BOX_START:
-                    self.boxProstate[index] = [frameName, pointPixel[0], pointPixel[1], pointPixel[0], pointPixel[1]]
-                elif startDrawEnd == BOX_DRAW:
-                    self.boxProstate[index][3:] = [pointPixel[0], pointPixel[1]]
-                else:
-                    self.boxProstate[index][1:] = su.getBoundingBoxStartAndEnd(self.boxProstate[index][1:])
-                    self.__saveToDisk(SAVE_POINT_DATA)
+        boxes = self.boxProstate if prostateBladder == PROSTATE else self.boxBladder
+        index = self._getFrameBoxIndex(prostateBladder, frameName)
+        if index > -1:
+            if startDrawEnd == BOX_START:
+                boxes[index] = [frameName, pointPixel[0], pointPixel[1], pointPixel[0], pointPixel[1]]
+            elif startDrawEnd == BOX_DRAW:
+                boxes[index][3:] = [pointPixel[0], pointPixel[1]]
             else:
-                self.boxProstate.append([frameName, pointPixel[0], pointPixel[1], pointPixel[0], pointPixel[1]])
+                boxes[index][1:] = su.getBoundingBoxStartAndEnd(boxes[index][1:])
+                self.__saveToDisk(SAVE_POINT_DATA)
         else:
-            index = su.getIndexOfFrameInBoxPoints(self.boxBladder, frameName)
-            if index > -1:
-                if startDrawEnd == BOX_START:
-                    self.boxBladder[index] = [frameName, pointPixel[0], pointPixel[1], pointPixel[0], pointPixel[1]]
-                elif startDrawEnd == BOX_DRAW:
-                    self.boxBladder[index][3:] = [pointPixel[0], pointPixel[1]]
-                else:
-                    self.boxBladder[index][1:] = su.getBoundingBoxStartAndEnd(self.boxBladder[index][1:])
-                    self.__saveToDisk(SAVE_POINT_DATA)
-            else:
-                self.boxBladder.append([frameName, pointPixel[0], pointPixel[1], pointPixel[0], pointPixel[1]])
+            boxes.append([frameName, pointPixel[0], pointPixel[1], pointPixel[0], pointPixel[1]])
+            self._pointsChanged()
 
     def addOrRemovePoint(self, pointDisplay: list, prostateBladder, deleteRadius=10):
         """
         Add or remove a point to/from self.pointsProstate or self.pointsBladder. Point data is saved in pixel values.
-        If the new point is within a radius of an old point, the old point is removed.
+        If the new point is within a radius of an old point, the old point (the first one, in list order) is removed.
 
         Args:
             pointDisplay: x/width-, and y/height-coordinates returned by the canvas elements' event.
             prostateBladder: Add or remove points to either prostate points or bladder points.
             deleteRadius: Points within this radius will be deleted.
         """
-        pointPixel = su.displayToPixels(pointDisplay, self.frames[self.currentFrame - 1].shape, self.displayDimensions)
+        pointPixel = su.displayToPixels(pointDisplay, self.frameShape, self.displayDimensions)
+        frameName = self.frameNames[self.currentFrame - 1]
+        points = self.pointsProstate if prostateBladder == PROSTATE else self.pointsBladder
 
+        # Points on the current frame.
+        indices = self._getFramePointIndices(prostateBladder, frameName)
         pointRemoved = False
-
-        if prostateBladder == PROSTATE:
-            for point in self.pointsProstate:
-                if self.frameNames[self.currentFrame - 1] == point[0]:
-                    # If within radius of another point, remove that point.
-                    if su.pointInRadius(point[1:], pointPixel, deleteRadius):
-                        self.pointsProstate.remove(point)
-                        pointRemoved = True
-                        break
-            # If no point was removed, add the new point.
-            if not pointRemoved:
-                self.pointsProstate.append([self.frameNames[self.currentFrame - 1], pointPixel[0], pointPixel[1]])
+        if indices and deleteRadius > 0:
+            # If within radius of other points, remove the first one by its index (no second search of the points).
+            distances = ((np.array([points[i][1:] for i in indices], dtype=float) - pointPixel) ** 2).sum(axis=1)
+            withinRadius = np.flatnonzero(distances < deleteRadius ** 2)
+            if withinRadius.size:
+                points.pop(indices[withinRadius[0]])
+                pointRemoved = True
+        # If no point was removed, add the new point. Appending leaves the other indices valid, so the frame index is
+        # extended rather than cleared.
+        if not pointRemoved:
+            points.append([frameName, pointPixel[0], pointPixel[1]])
+            index = self.framePointsIndex.get(prostateBladder)
+            if index is not None:
+                index.setdefault(frameName, []).append(len(points) - 1)
         else:
-            for point in self.pointsBladder:
-                if self.frameNames[self.currentFrame - 1] == point[0]:
-                    # If within radius of another point, remove that point.
-                    if su.pointInRadius(point[1:], pointPixel, 5):
-                        self.pointsBladder.remove(point)
-                        pointRemoved = True
-                        break
-            # If no point was removed, add the new point.
-            if not pointRemoved:
-                self.pointsBladder.append([self.frameNames[self.currentFrame - 1], pointPixel[0], pointPixel[1]])
+            self._pointsChanged()
         # Save point data to disk.
         self.__saveToDisk(SAVE_POINT_DATA)
 
     def __saveToDisk(self, saveType: str):
         """
-        Save all in memory data to relevant .txt files. This should be called whenever a value is changed. All previous
-        values are overwritten and the current values stored.
+        Mark the in memory data as changed, it is written to disk (see flush) once no further changes have been made for
+        SAVE_DELAY ms. This should be called whenever a value is changed.
+
+        Args:
+            saveType: Which data to save to disk.
+        """
+        self.unsavedTypes.add(saveType)
+        if self.saveTimer is None:
+            self.saveTimer = QTimer()
+            self.saveTimer.setSingleShot(True)
+            self.saveTimer.setInterval(SAVE_DELAY)
+            self.saveTimer.timeout.connect(self.flush)
+        self.saveTimer.start()
+
+    def flush(self):
+        """
+        Write any changed data to disk now. Must be called before the files are read or copied, and before closing.
+        """
+        if self.saveTimer is not None:
+            self.saveTimer.stop()
+        unsavedTypes, self.unsavedTypes = self.unsavedTypes, set()
+        for saveType in unsavedTypes:
+            self.__writeToDisk(saveType)
+
+    def discardUnsaved(self):
+        """
+        Forget any changed data not yet written to disk, used when the files on disk are to be read back as they are.
+        """
+        if self.saveTimer is not None:
+            self.saveTimer.stop()
+        self.unsavedTypes = set()
+
+    def __writeToDisk(self, saveType: str):
+        """
+        Save all in memory data to relevant .txt files. All previous values are overwritten and the current values
+        stored.
 
         Args:
             saveType: Which data to save to disk.
@@ -359,16 +581,13 @@ class Scan:
                             'Bladder': self.pointsBladder,
                             'ProstateBox': self.boxProstate,
                             'BladderBox': self.boxBladder}
-                with open(self.pointPath, 'w') as pointFile:
-                    json.dump(saveData, pointFile, indent=4)
+                su.writeJSONFile(self.pointPath, saveData)
 
             if saveType in [SAVE_BULLET_DATA, SAVE_ALL]:
-                with open(self.bulletPath, 'w') as bulletFile:
-                    json.dump(self.bulletData, bulletFile, indent=4)
+                su.writeJSONFile(self.bulletPath, self.bulletData)
 
             if saveType in [SAVE_IPV_DATA, SAVE_ALL]:
-                with open(self.ipvPath, 'w') as ipvFile:
-                    json.dump(self.ipvData, ipvFile, indent=4)
+                su.writeJSONFile(self.ipvPath, self.ipvData)
 
         except Exception as e:
             print(f'\tError saving details to file: {e}')
@@ -382,10 +601,12 @@ class Scan:
         prostateBladder: PROSTATE or BLADDER.
         """
         frameName = self.frameNames[self.currentFrame - 1]
-        if prostateBladder == PROSTATE:
-            self.boxProstate = [p for p in self.boxProstate if not p[0] == frameName]
-        else:
-            self.boxBladder = [p for p in self.boxBladder if not p[0] == frameName]
+        boxes = self.boxProstate if prostateBladder == PROSTATE else self.boxBladder
+        # Delete the frame's boxes in place, found through the frame index, last first so the remaining indices stay
+        # valid.
+        for index in reversed(self._getFrameBoxIndices(prostateBladder, frameName)):
+            del boxes[index]
+        self._pointsChanged()
 
         self.__saveToDisk(SAVE_POINT_DATA)
 
@@ -394,10 +615,11 @@ class Scan:
         Clear points on the currently displayed frame, then save to disk.
         """
         frameName = self.frameNames[self.currentFrame - 1]
-        if prostateBladder == PROSTATE:
-            self.pointsProstate = [p for p in self.pointsProstate if not p[0] == frameName]
-        else:
-            self.pointsBladder = [p for p in self.pointsBladder if not p[0] == frameName]
+        points = self.pointsProstate if prostateBladder == PROSTATE else self.pointsBladder
+        # Delete the frame's points in place, last first so the remaining indices stay valid.
+        for index in reversed(self._getFramePointIndices(prostateBladder, frameName)):
+            del points[index]
+        self._pointsChanged()
 
         self.__saveToDisk(SAVE_POINT_DATA)
 
@@ -407,6 +629,7 @@ class Scan:
         """
         self.boxProstate = []
         self.boxBladder = []
+        self._pointsChanged()
 
         self.__saveToDisk(SAVE_POINT_DATA)
 
@@ -416,13 +639,15 @@ class Scan:
         """
         self.pointsProstate = []
         self.pointsBladder = []
+        self._pointsChanged()
 
         self.__saveToDisk(SAVE_POINT_DATA)
 
     def loadSaveData(self, saveName: str):
         """
         Load the saved PointData.JSON, BulletData.JSON, Editing.txt, and IPV.JSON  files from the directory selected.
-        This will overwrite the current files in the recording directory.
+        This will overwrite the current files in the recording directory, and the data held by the Scan is updated in
+        place.
 
         Args:
             saveName (str): Directory containing files to be loaded.
@@ -431,27 +656,28 @@ class Scan:
             successFlags (bool): True if the load was successful, else False.
         """
         print(f'Loading Data: {saveName}')
+        # Pending changes must not be written over the loaded files.
+        self.flush()
         successFlags = [True, True, True, True]
-        try:
-            shutil.copy(Path(self.path, 'Save Data/' + saveName + '/' + self.bulletPath.name), self.bulletPath)
-        except Exception as e:
-            ErrorDialog(None, 'Error loading bullet data.', e)
-            Path(self.bulletPath).unlink(missing_ok=True)
-            successFlags[0] = False
-
-        try:
-            shutil.copy(Path(self.path, 'Save Data/' + saveName + '/' + self.pointPath.name), self.pointPath)
-        except Exception as e:
-            ErrorDialog(None, 'Error loading point data', e)
-            Path(self.pointPath).unlink(missing_ok=True)
-            successFlags[1] = False
-
-        try:
-            shutil.copy(Path(self.path, 'Save Data/' + saveName + '/' + self.editPath.name), self.editPath)
-        except Exception as e:
-            ErrorDialog(None, 'Error loading editing data', e)
-            Path(self.editPath).unlink(missing_ok=True)
-            successFlags[2] = False
+        savePath = Path(self.path, 'Save Data', saveName)
+        files = [(self.bulletPath, 'Error loading bullet data.'),
+                 (self.pointPath, 'Error loading point data'),
+                 (self.editPath, 'Error loading editing data')]
+        # Copy the files concurrently (the destinations exist, so their permissions are not copied), errors are shown
+        # here in order once all copies have finished.
+        with ThreadPoolExecutor(max_workers=len(files)) as executor:
+            copies = [executor.submit(shutil.copyfile, Path(savePath, path.name), path) for path, _ in files]
+        for i, ((path, message), copy) in enumerate(zip(files, copies)):
+            try:
+                copy.result()
+            except Exception as e:
+                ErrorDialog(None, message, e)
+                Path(path).unlink(missing_ok=True)
+                successFlags[i] = False
+
+        # Read back only the copied files, the frames and IMU data are unchanged.
+        self.editPath, self.imuOffset, self.imuPosition = su.getEditDataFromFile(self.path)
+        self._loadSaveFiles()
 
         return successFlags
 
@@ -473,8 +699,9 @@ class Scan:
         Args:
             prefix: Save name to be deleted.
         """
+        # Save folders are named {prefix}_{time}, the name is checked before the (stat) directory check.
         folders = [vd for vd in Path(f'{self.path}/Save Data').iterdir() if
-                   vd.is_dir() and vd.stem.split('_')[0] == prefix]
+                   vd.stem.startswith(f'{prefix}_') and vd.is_dir()]
 
         print(f'\tDeleting {len(folders)} save data folder(s)...')
 
@@ -501,15 +728,15 @@ class Scan:
             scan: Scan number.
         """
         try:
+            self.flush()
             saveDataPath = f'{self.path}/Save Data'
             userPath = Path(saveDataPath, f'{username}_{int(time.time() * 1000)}')
             # Create directory with username and current time in milliseconds.
             userPath.mkdir(parents=True, exist_ok=True)
-            # Copy current files to new user directory.
-            shutil.copy(self.bulletPath, Path(userPath, self.bulletPath.name))
-            shutil.copy(self.pointPath, Path(userPath, self.pointPath.name))
-            shutil.copy(self.editPath, Path(userPath, self.editPath.name))
-            shutil.copy(self.ipvPath, Path(userPath, self.ipvPath.name))
+            # Copy current files to new user directory, concurrently and without copying permissions.
+            paths = [self.bulletPath, self.pointPath, self.editPath, self.ipvPath]
+            with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+                list(executor.map(lambda path: shutil.copyfile(path, Path(userPath, path.name)), paths))
             print(f'\tScan {scan + 1} data saved to {userPath.name}')
 
         except Exception as e:
@@ -524,22 +751,20 @@ class Scan:
         Returns:
             Index of frame used as TS1 centre.
         """
-        folders = [vd.stem for vd in Path(f'{self.path}/Save Data').iterdir() if vd.is_dir()]
-        frame = self.currentFrame
-        for user in folders:
-            if user.split('_')[0] == 'TS1':
-                with open(f'{self.path}/Save Data/{user}/PointData.json', 'r') as file:
-                    data = json.load(file)
-                    prostateData = data.get('Prostate')
-                    framesWithPoints = []
-                    for row in prostateData:
-                        framesWithPoints.append(row[0])
-                framesWithPoints = sorted(set(framesWithPoints))
-                if self.scanPlane == PLANE_TRANSVERSE:
-                    frame = framesWithPoints[0]
-                else:
-                    frame = framesWithPoints[2]
-        return frame
+        mtime = Path(self.path, 'Save Data').stat().st_mtime_ns
+        if self.ts1Centre is None or self.ts1Centre[:2] != (self.path, mtime):
+            frame = None
+            for user in self.getSaveData():
+                if user.startswith('TS1_'):
+                    data = su.readJSONFile(Path(self.path, 'Save Data', user, 'PointData.json'))
+                    framesWithPoints = sorted(set(row[0] for row in data.get('Prostate')))
+                    if self.scanPlane == PLANE_TRANSVERSE:
+                        frame = framesWithPoints[0]
+                    else:
+                        frame = framesWithPoints[2]
+            self.ts1Centre = (self.path, mtime, frame)
+        frame = self.ts1Centre[2]
+        return self.currentFrame if frame is None else frame
 
     def frameAtScanPercent(self, percentage: int):
         """
@@ -555,9 +780,10 @@ class Scan:
         indexAtPercentage = 0
         # Find index.
         try:
-            axisAngles = su.quaternionsToAxisAngles(self.quaternions)
-
-            indexStart, indexEnd = su.estimateSlopeStartAndEnd(axisAngles)
+            # The start and end of the sweep are estimated once, any percentage is then a direct calculation.
+            if self.slopeStartEnd is None:
+                self.slopeStartEnd = su.estimateSlopeStartAndEnd(self.quaternionsToAxisAngles())
+            indexStart, indexEnd = self.slopeStartEnd
 
             indexFromStart = int((indexEnd - indexStart) * (percentage / 100))
 
@@ -593,34 +819,20 @@ class Scan:
                     self.pointsProstate.append([self.frameNames[self.currentFrame - 1], newPoint[0], newPoint[1]])
                 else:
                     self.pointsBladder.append([self.frameNames[self.currentFrame - 1], newPoint[0], newPoint[1]])
+            self._pointsChanged()
             self.__saveToDisk(SAVE_POINT_DATA)
 
     def quaternionsToAxisAngles(self) -> list:
         """
-        Convert quaternions to a list of axis angles (in degrees) in the following manner:
-            1. Get the initial quaternion, to be used as the reference quaternion.
-            2. Calculate the difference between all subsequent quaternions and the initial quaternion using:
-                    r = p * conj(q)
-               where r is the difference quaternion, p is the initial quaternion, and conj(q) is the conjugate of the
-               current quaternion.
-            3. Calculate the axis angle of r (the difference quaternion).
-
-        Converting the raw quaternions to their axis angle representation for rotation comparisons is not the correct
-        way to do it, the axis angle has to be calculated from the quaternion difference.
+        Convert the quaternions of the Scan to a list of axis angles (in degrees) relative to the first rotation, see
+        su.quaternionsToAxisAngles. The angles are calculated once per load, the returned list must not be modified.
 
         Returns:
             axisAngles (list): List of axis angles (in degrees) relative to the first rotation (taken as 0 degrees).
         """
-        initialQ = Quaternion(self.quaternions[0])
-        axis_angles = []
-        # Get angle differences (as quaternion rotations).
-        for row in self.quaternions:
-            q = Quaternion(row)
-            r = initialQ * q.conjugate
-
-            axis_angles.append(180 / np.pi * 2 * np.arctan2(np.sqrt(r[1] ** 2 + r[2] ** 2 + r[3] ** 2), r[0]))
-
-        return axis_angles
+        if self.axisAngles is None:
+            self.axisAngles = su.quaternionsToAxisAngles(self.quaternions)
+        return self.axisAngles
 
     def shrinkExpandPoints(self, amount, prostateBladder):
         """
@@ -630,18 +842,14 @@ class Scan:
             amount: How much to shrink or expand by.
             prostateBladder: Shrink or expand either prostate or bladder points.
         """
-        points = self.getPointsOnFrame(prostateBladder)
+        points = self.pointsProstate if prostateBladder == PROSTATE else self.pointsBladder
+        indices = self._getFramePointIndices(prostateBladder, self.frameNames[self.currentFrame - 1])
 
-        if points:
-            newPoints = Utils.shrinkExpandPoints(points, amount)
-
-            self.clearFramePoints(prostateBladder)
-
-            for newPoint in newPoints:
-                self.pointsProstate.append([self.frameNames[self.currentFrame - 1], newPoint[0],
-                                            newPoint[
-                                                1]]) if prostateBladder == PROSTATE else self.pointsBladder.append(
-                    [self.frameNames[self.currentFrame - 1], newPoint[0], newPoint[1]])
+        if indices:
+            newPoints = Utils.shrinkExpandPoints([points[i][1:] for i in indices], amount)
+            # Move the points in place, the frame index is unchanged.
+            for i, newPoint in zip(indices, newPoints):
+                points[i][1:] = newPoint
 
             self.__saveToDisk(SAVE_POINT_DATA)
 
@@ -656,16 +864,8 @@ class Scan:
         Returns:
             count: Count of points on frame.
         """
-        if prostateBladder == PROSTATE:
-            if position is not None:
-                count = sum(1 for p in self.pointsProstate if p[0] == self.frameNames[position])
-            else:
-                count = sum(1 for p in self.pointsProstate if p[0] == self.frameNames[self.currentFrame - 1])
-        else:
-            if position is not None:
-                count = sum(1 for p in self.pointsBladder if p[0] == self.frameNames[position])
-            else:
-                count = sum(1 for p in self.pointsBladder if p[0] == self.frameNames[self.currentFrame - 1])
+        frameName = self.frameNames[self.currentFrame - 1 if position is None else position]
+        count = len(self._getFramePointIndices(prostateBladder, frameName))
 
         return count
 
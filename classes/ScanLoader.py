@@ -0,0 +1,91 @@
+# ScanLoader.py
+
+"""Load the frames of a Scan on a QThreadPool worker so the GUI remains responsive."""
+import traceback
+
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+from classes import ScanUtil as su
+
+
+class ScanLoaderSignals(QObject):
+    """
+    Signals emitted by a ScanLoader. QRunnable is not a QObject, so the signals live here.
+
+    progress: Percentage of frames loaded.
+    finished: Array of loaded frames (backed by ScanLoader.framesShm), or None if the load was aborted.
+    error: Exception raised while loading.
+    """
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)
+    error = pyqtSignal(object)
+
+
+class ScanLoader(QRunnable):
+    def __init__(self, scanPath: str, windowWidth: int = None):
+        """
+        Initialise a ScanLoader for the Scan at scanPath. Start it with QThreadPool.globalInstance().start(loader).
+
+        Args:
+            scanPath: Path to Scan directory as a String.
+            windowWidth: Width of the Main Window central widget, if given the first frames shown are also resized
+                for display (see displayFrames).
+        """
+        super().__init__()
+        self.scanPath = scanPath
+        self.windowWidth = windowWidth
+        self.signals = ScanLoaderSignals()
+        self.aborted = False
+        self.lastProgress = -1
+        # Shared memory block the frames are decoded into, owned by the loader until taken by a Scan.
+        self.framesShm = None
+        # First frame and its neighbours resized for display, {index: (display dimensions, frame)}.
+        self.displayFrames = {}
+        # IMU data read alongside the frames, see su.getIMUDataFromFile.
+        self.imuData = None
+
+    def abort(self):
+        """Stop loading frames, finished will be emitted with None."""
+        self.aborted = True
+
+    def releaseFrames(self):
+        """Release the shared memory block of frames that were not taken by a Scan."""
+        if self.framesShm is not None:
+            self.framesShm.close()
+            self.framesShm.unlink()
+            self.framesShm = None
+
+    def run(self):
+        """Load the frames and IMU data, emitting progress as the frames are decoded."""
+        try:
+            frames = su.loadFrames(self.scanPath, self._onProgress, lambda: self.aborted, self._allocate)
+            if self.aborted:
+                frames = None
+                self.releaseFrames()
+            else:
+                self.imuData = su.getIMUDataFromFile(self.scanPath)
+                if self.windowWidth and len(frames):
+                    self._resizeFirstFrames(frames)
+            self.signals.finished.emit(frames)
+        except Exception as e:
+            # The traceback keeps the frames (a view of the block) alive, which prevents it from being closed.
+            traceback.clear_frames(e.__traceback__)
+            self.releaseFrames()
+            self.signals.error.emit(e)
+
+    def _resizeFirstFrames(self, frames):
+        """Resize the first frame and its neighbours (in both directions, as navigation wraps) for display."""
+        dd = su.getDisplayDimensions(self.windowWidth, frames[0].shape)
+        for index in sorted({i % len(frames) for i in [0, 1, 2, -1, -2]}):
+            self.displayFrames[index] = (dd, su.resizeFrameForDisplay(frames[index], dd))
+
+    def _allocate(self, shape: tuple, dtype):
+        """Allocate the shared memory block the frames are decoded into."""
+        self.framesShm, frames = su.createSharedFrames(shape, dtype)
+        return frames
+
+    def _onProgress(self, percentage: int):
+        """Only emit progress when the percentage changes."""
+        if percentage != self.lastProgress:
+            self.lastProgress = percentage
+            self.signals.progress.emit(percentage)
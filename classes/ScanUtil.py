@@ -3,6 +3,8 @@ import json
 import math
 import os
 import stat
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
 from pathlib import Path
 
 import cv2
@@ -10,11 +12,21 @@ import matplotlib.patches as patches
 import numpy as np
 from matplotlib import pyplot as plt
 from matplotlib.axes import Axes
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
 from matplotlib.markers import MarkerStyle
 from matplotlib.patches import Polygon
 from natsort import natsorted
 from numpy.lib.stride_tricks import sliding_window_view
-from pyquaternion import Quaternion
+
+# orjson is optional, it serialises the save data far faster than the json module.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Threads used to decode frames, cv2 releases the GIL while decoding but storage contention caps the benefit at ~8.
+LOAD_FRAMES_WORKERS = min(8, os.cpu_count() or 1)
 
 # Rotates the '+' marker by 45 degrees.
 m = MarkerStyle('+')
@@ -32,55 +44,155 @@ BULLET_COL = {
 }
 
 
-def loadFrames(scanPath: str):
+def loadFrames(scanPath: str, progressCallback=None, abortCallback=None, allocate=None):
     """
-    Load all .png images in scanPath as frames into a multidimensional list.
+    Load all .png images in scanPath as frames into a multidimensional list. Frames are decoded in parallel on
+    LOAD_FRAMES_WORKERS threads as single channel uint8 (B-mode frames have no colour, exported frames are read the
+    same way), the returned frames remain in file order.
 
     Args:
         scanPath: String representation of the recording path.
+        progressCallback: Optional callable, given the percentage of frames loaded after each frame.
+        abortCallback: Optional callable, loading stops early if it returns True.
+        allocate: Optional callable, given the shape and dtype of the stacked frames (taken from the first frame) it
+            returns the ndarray that frames are decoded directly into, e.g. backed by createSharedFrames. This avoids
+            holding a list of frames and a copy of them at the same time. All frames must then have the same shape.
 
     Returns:
-        List of all the .png frames saved in the recording path directory.
+        List of all the .png frames saved in the recording path directory (or the array returned by allocate), or None
+        if loading was aborted.
+    """
+    # The .png files at given path, DirEntry caches the file type so no extra stat call is made per file.
+    with os.scandir(scanPath) as entries:
+        framePaths = [entry.path for entry in natsorted(entries, key=lambda e: e.name)
+                      if entry.name.endswith('.png') and entry.is_file()]
+
+    frames = [None] * len(framePaths)
+    # Frames already loaded before the pool is started.
+    loaded = 0
+    if allocate is not None and framePaths:
+        firstFrame = cv2.imread(framePaths[0], cv2.IMREAD_GRAYSCALE)
+        frames = allocate((len(framePaths), *firstFrame.shape), firstFrame.dtype)
+        frames[0] = firstFrame
+        loaded = 1
+
+    def readFrame(index: int):
+        frames[index] = cv2.imread(framePaths[index], cv2.IMREAD_GRAYSCALE)
+
+    with ThreadPoolExecutor(max_workers=LOAD_FRAMES_WORKERS) as executor:
+        futures = [executor.submit(readFrame, i) for i in range(loaded, len(framePaths))]
+        for i, future in enumerate(futures, start=loaded):
+            if abortCallback is not None and abortCallback():
+                for remaining in futures[i - loaded:]:
+                    remaining.cancel()
+                return None
+            future.result()
+            if progressCallback is not None:
+                progressCallback(int((i + 1) * 100 / len(framePaths)))
+    return frames
+
+
+def getDisplayDimensions(windowWidth: int, frameShape: tuple):
     """
-    # All files and subdirectories at given path.
-    allContents = natsorted(os.listdir(scanPath))
+    Return the dimensions of the canvas used to display frames of the given shape. The width of the canvas is 48% of
+    the Main Window width with an aspect ratio that matches the frame.
 
-    frames = []
+    Args:
+        windowWidth: Width of the Main Window central widget.
+        frameShape: Shape of the frames.
 
-    for file in allContents:
-        if file.split('.')[-1] == 'png':
-            img = cv2.imread(f'{scanPath}/{file}', cv2.IMREAD_UNCHANGED)
-            frames.append(img)
-    return frames
+    Returns:
+        Display dimensions [width, height].
+    """
+    width = windowWidth * 0.48
+    height = frameShape[0] * width / frameShape[1]
 
+    return [int(width), int(height)]
 
-def drawFrameOnAxis(axis: Axes, frame: np.ndarray):
+
+def resizeFrameForDisplay(frame: np.ndarray, dd: list, dst: np.ndarray = None) -> np.ndarray:
     """
-    Clear the given axis and plot a new frame with imshow. Enforce axis limits.
+    Resize a frame to the display dimensions and draw the corner markers on it.
+
+    Args:
+        frame: Frame to be resized, it is not modified.
+        dd: Display dimensions.
+        dst: Array the resized frame is written to, reused if its shape and type match, otherwise a new one is made.
+
+    Returns:
+        Resized frame.
+    """
+    # Bilinear for both shrinking and enlarging, the display dimensions are rarely an integer fraction of the frame
+    # dimensions, and for other factors area averaging is several times slower.
+    displayFrame = cv2.resize(frame, dd, dst, interpolation=cv2.INTER_LINEAR)
+    # Corner markers.
+    displayFrame[-1][-1], displayFrame[-1][0], displayFrame[0][-1], displayFrame[0][0] = 255, 255, 255, 255
+
+    return displayFrame
+
+
+def createSharedFrames(shape: tuple, dtype):
+    """
+    Create a shared memory block sized for frames of the given shape and dtype, so other processes (PlayCine) can view
+    the frames without copying them. The block must be closed and unlinked by its owner.
+
+    Args:
+        shape: Shape of the stacked frames.
+        dtype: Type of the frames.
+
+    Returns:
+        SharedMemory block and an ndarray view of it.
+    """
+    dtype = np.dtype(dtype)
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def drawFrameOnAxis(axis: Axes, frame: np.ndarray, new=False, keep=()):
+    """
+    Plot a new frame on the given axis. If the axis already shows a frame of the same shape and type, only the image
+    data is replaced and the previous overlays (points, masks, boxes, text) are removed, otherwise the axis is cleared
+    and the frame is plotted with imshow, enforcing axis limits.
 
     Args:
         axis: Axis used to display frame.
         frame: Frame to be drawn on axis.
+        new: If True, always clear the axis and reset the axis limits.
+        keep: Overlay artists that are updated in place and must not be removed.
 
     Returns:
         Nothing returned as data is drawn directly on axis.
     """
+    images = axis.get_images()
+    if not new and images and images[0].get_array().shape == frame.shape and \
+            images[0].get_array().dtype == frame.dtype:
+        for artist in [*axis.lines, *axis.patches, *axis.texts, *axis.collections]:
+            if artist not in keep:
+                artist.remove()
+        images[0].set_data(frame)
+        return
+
     axis.cla()
     axis.axis('off')
-    axis.imshow(frame, cmap='gray')
+    # Fixed uint8 normalisation avoids a per-frame min/max pass, and the frame is already resized to the display
+    # dimensions so no further resampling is needed.
+    if frame.dtype == np.uint8:
+        axis.imshow(frame, cmap='gray', vmin=0, vmax=255, interpolation='nearest')
+    else:
+        axis.imshow(frame, cmap='gray', interpolation='nearest')
     axis.set_xlim(-.1, frame.shape[1])
     axis.set_ylim(frame.shape[0], -0.5)
 
 
-def drawScanDataOnAxis(axis: Axes, frameNumber: int, frameCount: int, depths: list, imuOff: float, imuPos: float,
-                       frameProstatePoints: int, frameBladderPoints: int, totalProstatePoints: int,
-                       totalBladderPoints: int, totalProstateBoxes: int, totalBladderBoxes: int, dd: list):
+def getScanDataTexts(frameNumber: int, frameCount: int, depths: list, imuOff: float, imuPos: float,
+                     frameProstatePoints: int, frameBladderPoints: int, totalProstatePoints: int,
+                     totalBladderPoints: int, totalProstateBoxes: int, totalBladderBoxes: int, dd: list):
     """
-    Plot extra details about the Scan on the frame.
+    Return the extra details about the Scan shown on the frame. They are painted by the canvas with Qt rather than
+    drawn as Matplotlib text, which dominated the cost of drawing a frame.
 
     Parameters
     ----------
-    axis: Axis displaying frame.
     frameNumber: Current frame number.
     frameCount: Total number of frames in scan.
     depths: Height and Width of scan in mm.
@@ -96,26 +208,46 @@ def drawScanDataOnAxis(axis: Axes, frameNumber: int, frameCount: int, depths: li
 
     Returns
     -------
-    None
-    """
-    # Scan width and depth in mm.
-    axis.text(dd[0] - 120, 30, f'<- {int(depths[1])}mm ->', color='white')
-    axis.text(dd[0] - 30, 130, f'<- {int(depths[0])}mm ->', color='white', rotation=-90)
-    # IMU offset and position details.
-    axis.text(20, 40, f'IMU Offset: {imuOff:.1f}mm', color='lightblue')
-    axis.text(20, 60, f'IMU Position: {imuPos:.1f}%', color='lightblue')
-    # Current frame number over total frames.
-    axis.text(dd[0] - 150, dd[1] - 20, f'Frame {frameNumber} of {frameCount}', color='white')
-    # Location of IMU in relation to width, a percentage of width.
-    axis.plot([imuPos / 100 * dd[0], imuPos / 100 * dd[0]], [0, 10], color='white', linewidth=2)
-    # Points' indicator.
-    axis.text(20, dd[1] - 80, f'Prostate Points: {frameProstatePoints}/{totalProstatePoints}', color='white')
-    axis.text(20, dd[1] - 60, f'Bladder Points: {frameBladderPoints}/{totalBladderPoints}', color='white')
-    axis.text(20, dd[1] - 40, f'Prostate Boxes: {totalProstateBoxes}', color='white')
-    axis.text(20, dd[1] - 20, f'Bladder Boxes: {totalBladderBoxes}', color='white')
-
-
-def drawMaskOnAxis(axis: Axes, points: list, fd: list, dd: list, color):
+    List of (x, y, text, colour, rotation), positioned in display coordinates.
+    """
+    return [
+        # Scan width and depth in mm.
+        (dd[0] - 120, 30, f'<- {int(depths[1])}mm ->', 'white', 0),
+        (dd[0] - 30, 130, f'<- {int(depths[0])}mm ->', 'white', -90),
+        # IMU offset and position details.
+        (20, 40, f'IMU Offset: {imuOff:.1f}mm', 'lightblue', 0),
+        (20, 60, f'IMU Position: {imuPos:.1f}%', 'lightblue', 0),
+        # Current frame number over total frames.
+        (dd[0] - 150, dd[1] - 20, f'Frame {frameNumber} of {frameCount}', 'white', 0),
+        # Points' indicator.
+        (20, dd[1] - 80, f'Prostate Points: {frameProstatePoints}/{totalProstatePoints}', 'white', 0),
+        (20, dd[1] - 60, f'Bladder Points: {frameBladderPoints}/{totalBladderPoints}', 'white', 0),
+        (20, dd[1] - 40, f'Prostate Boxes: {totalProstateBoxes}', 'white', 0),
+        (20, dd[1] - 20, f'Bladder Boxes: {totalBladderBoxes}', 'white', 0)]
+
+
+def drawIMUPositionOnAxis(axis: Axes, imuPos: float, dd: list, line: Line2D = None):
+    """
+    Draw the location of the IMU in relation to the frame width, a percentage of width.
+
+    Args:
+        axis: Axis displaying frame.
+        imuPos: IMU position as a percent of frame width.
+        dd: Display dimensions.
+        line: Line previously returned, its position is replaced if it is still on the axis.
+
+    Returns:
+        Line marking the IMU position, to be passed back in on the next call.
+    """
+    imuX = [imuPos / 100 * dd[0], imuPos / 100 * dd[0]]
+    if line is not None and line in axis.lines:
+        line.set_xdata(imuX)
+        return line
+
+    return axis.plot(imuX, [0, 10], color='white', linewidth=2)[0]
+
+
+def drawMaskOnAxis(axis: Axes, points: list, fd: list, dd: list, color, polygon: Polygon = None):
     """
     Draw a polygon mask using the points given. If there are too few points the mask will not be drawn.
 
@@ -125,15 +257,26 @@ def drawMaskOnAxis(axis: Axes, points: list, fd: list, dd: list, color):
         fd: Frame dimensions.
         dd: Display dimensions.
         color: Colour of mask.
+        polygon: Polygon previously returned for this mask, its vertices are replaced if it is still on the axis.
+
+    Returns:
+        Polygon drawing the mask (None if it has not been created yet), to be passed back in on the next call.
     """
     # Convert points from frame coordinates to canvas coordinates.
-    points = [pixelsToDisplay(point, fd, dd) for point in points]
-    if len(points) > 1:
-        polygon = Polygon(points, closed=True, alpha=0.2, color=color)
+    pointsDisplay = pixelsToDisplayArray(points, fd, dd)
+    if polygon is not None and polygon in axis.patches:
+        if len(pointsDisplay) > 1:
+            polygon.set_xy(pointsDisplay)
+        polygon.set_visible(len(pointsDisplay) > 1)
+        return polygon
+
+    if len(pointsDisplay) > 1:
+        polygon = Polygon(pointsDisplay, closed=True, alpha=0.2, color=color)
         axis.add_patch(polygon)
+        return polygon
 
 
-def drawBoxOnAxis(axis: Axes, points: list, fd: list, dd: list, color):
+def drawBoxOnAxis(axis: Axes, points: list, fd: list, dd: list, color, artists: tuple = None):
     """
     Draw a bounding box using the points given. Top left and bottom right.
 
@@ -143,22 +286,41 @@ def drawBoxOnAxis(axis: Axes, points: list, fd: list, dd: list, color):
         fd: Frame dimensions.
         dd: Display dimensions.
         color: Colour of box.
-    """
+        artists: Rectangle and A/B labels previously returned for this box, updated if they are still on the axis.
+
+    Returns:
+        Rectangle and A/B labels drawing the box (None if not created yet), to be passed back in on the next call.
+    """
+    if artists is not None and artists[0] in axis.patches:
+        rect, textA, textB = artists
+        if len(points) > 1:
+            start = pixelsToDisplay(points[:2], fd, dd)
+            end = pixelsToDisplay(points[2:], fd, dd)
+            textA.set_position(start)
+            textB.set_position(end)
+            rect.set_xy(start)
+            rect.set_width(end[0] - start[0])
+            rect.set_height(end[1] - start[1])
+        for artist in artists:
+            artist.set_visible(len(points) > 1)
+        return artists
+
     # Convert points from frame coordinates to canvas coordinates.
     if len(points) > 1:
         points = [points[:2], points[2:]]
         points = [pixelsToDisplay(point, fd, dd) for point in points]
-        axis.text(points[0][0], points[0][1], 'A', color=color)
-        axis.text(points[1][0], points[1][1], 'B', color=color)
+        textA = axis.text(points[0][0], points[0][1], 'A', color=color)
+        textB = axis.text(points[1][0], points[1][1], 'B', color=color)
         rect = patches.Rectangle(points[0], points[1][0] - points[0][0], points[1][1] - points[0][1], linewidth=1,
                                  edgecolor=color, facecolor='none')
         axis.add_patch(rect)
+        return rect, textA, textB
 
 
 def getBoundingBoxStartAndEnd(points):
     """
-    Find the start and end of the bounding box, assuming top left is start and bottom right is end. This does not work
-    as intended, it just forces a left to right, top to bottom bounding box to be drawn.
+    Find the start and end of the bounding box, assuming top left is start and bottom right is end. This forces a
+    left to right, top to bottom bounding box however it was drawn.
     Parameters
     ----------
     points: Current start and end points of the bounding box.
@@ -167,23 +329,9 @@ def getBoundingBoxStartAndEnd(points):
     -------
     Start and end points of the bounding box.
     """
-    # Convert 2 points into 4 corners of rectangle.
-    pointsArray = np.array([[points[0], points[1]],
-                            [points[0], points[3]],
-                            [points[2], points[3]],
-                            [points[2], points[1]]])
-
-    # Find start point (top left: min_x then min_y).
-    x_min = np.where(pointsArray[:, 0] == pointsArray[:, 0].min())[0]
-    y_min = np.where(pointsArray[x_min, 1] == pointsArray[x_min, 1].min())[0]
-    top_left = (pointsArray[x_min[y_min[0]]])
-
-    # Find end point (bottom right: max_x then max_y).
-    x_max = np.where(pointsArray[:, 0] == pointsArray[:, 0].max())[0]
-    y_max = np.where(pointsArray[x_max, 1] == pointsArray[x_max, 1].max())[0]
-    bottom_right = pointsArray[x_max[y_max[0]]]
-
-    results = [int(top_left[0]), int(top_left[1]), int(bottom_right[0]), int(bottom_right[1])]
+    # Top left is the minimum x and y of the 2 points, bottom right the maximum.
+    results = [int(min(points[0], points[2])), int(min(points[1], points[3])),
+               int(max(points[0], points[2])), int(max(points[1], points[3]))]
 
     return results
 
@@ -231,25 +379,22 @@ def drawBulletDataOnAxis(axis: Axes, name: str, bullet: dict, fd: list, dd: list
         fd: Dimensions of original frame (x, y).
         dd: Display dimension - shape of the displayed frame.
     """
-    # Plot all the bullet end points.
-    for k in bullet:
-        if bullet[k][0] == name:
-            pointDisplay = pixelsToDisplay(bullet[k][1:], fd, dd)
-            axis.plot(pointDisplay[0], pointDisplay[1], marker='*', color=BULLET_COL[k], markersize=5)
-            axis.text(pointDisplay[0] - 20, pointDisplay[1] - 10, k, color=BULLET_COL[k])
-    # Plot connecting lines where necessary.
-    if name == bullet['L1'][0] and name == bullet['L2'][0]:
-        l1 = pixelsToDisplay(bullet['L1'][1:], fd, dd)
-        l2 = pixelsToDisplay(bullet['L2'][1:], fd, dd)
-        axis.plot([l1[0], l2[0]], [l1[1], l2[1]], color=BULLET_COL['L1'], linewidth=1, linestyle='--')
-    if name == bullet['W1'][0] and name == bullet['W2'][0]:
-        w1 = pixelsToDisplay(bullet['W1'][1:], fd, dd)
-        w2 = pixelsToDisplay(bullet['W2'][1:], fd, dd)
-        axis.plot([w1[0], w2[0]], [w1[1], w2[1]], color=BULLET_COL['W1'], linewidth=1, linestyle='--')
-    if name == bullet['H1'][0] and name == bullet['H2'][0]:
-        h1 = pixelsToDisplay(bullet['H1'][1:], fd, dd)
-        h2 = pixelsToDisplay(bullet['H2'][1:], fd, dd)
-        axis.plot([h1[0], h2[0]], [h1[1], h2[1]], color=BULLET_COL['H1'], linewidth=1, linestyle='--')
+    # Bullet end points on this frame, all drawn as a single artist.
+    keys = [k for k in bullet if bullet[k][0] == name]
+    if not keys:
+        return
+    pointsDisplay = {k: pixelsToDisplay(bullet[k][1:], fd, dd) for k in keys}
+    axis.scatter([pointsDisplay[k][0] for k in keys], [pointsDisplay[k][1] for k in keys], marker='*', s=25,
+                 c=[BULLET_COL[k] for k in keys], linewidths=1, zorder=2)
+    for k in keys:
+        axis.text(pointsDisplay[k][0] - 20, pointsDisplay[k][1] - 10, k, color=BULLET_COL[k])
+    # Connecting lines where both end points are on this frame, also drawn as a single artist.
+    pairs = [(start, end) for start, end in [('L1', 'L2'), ('W1', 'W2'), ('H1', 'H2')]
+             if start in pointsDisplay and end in pointsDisplay]
+    if pairs:
+        axis.add_collection(LineCollection([[pointsDisplay[start], pointsDisplay[end]] for start, end in pairs],
+                                           colors=[BULLET_COL[start] for start, _ in pairs], linewidths=1,
+                                           linestyles='--'))
 
 
 def getIMUDataFromFile(scanPath: str):
@@ -344,6 +489,37 @@ def checkEditDataFile(scanPath: str) -> Path:
     return editPath
 
 
+def readJSONFile(path):
+    """
+    Read data from a JSON file, using orjson if it is installed.
+
+    Args:
+        path: Path to the JSON file.
+
+    Returns:
+        Data read from the file.
+    """
+    with open(path, 'rb') as file:
+        return orjson.loads(file.read()) if orjson is not None else json.load(file)
+
+
+def writeJSONFile(path, data):
+    """
+    Write data to a JSON file, overwriting it. The files are only read by the program, so they are written compactly
+    (without indentation), using orjson if it is installed.
+
+    Args:
+        path: Path to the JSON file.
+        data: JSON serialisable data.
+    """
+    if orjson is not None:
+        with open(path, 'wb') as file:
+            file.write(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, 'w') as file:
+            json.dump(data, file, separators=(',', ':'))
+
+
 def getPointDataFromFile(scanPath: str):
     """
         Helper function to get point data that has already been saved. If there is no file it is created. The prostate
@@ -408,7 +584,7 @@ def checkPointDataFile(scanPath: str):
     return pointPath
 
 
-def drawPointDataOnAxis(axis, points, fd, dd, colour):
+def drawPointDataOnAxis(axis, points, fd, dd, colour, line: Line2D = None):
     """
     Plot given points on the frame. Points are currently stored in pixels (including the IMU offset from the edge
     of the probe). These need to be converted to display coordinates.
@@ -419,14 +595,21 @@ def drawPointDataOnAxis(axis, points, fd, dd, colour):
         fd: Original frame dimensions (before resizing)
         dd: Display dimension - shape of the frame, first and second value swapped.
         colour: Colour of points (limegreen - prostate, lightblue - bladder)
+        line: Line previously returned for these points, its data is replaced if it is still on the axis.
 
     Returns:
-        Nothing returned as data is drawn directly on axis.
+        Line drawing the points, to be passed back in on the next call.
     """
-    for point in points:
-        pointDisplay = pixelsToDisplay(point, fd, dd)
+    # Convert all points at once and draw them as a single artist.
+    pointsDisplay = pixelsToDisplayArray(points, fd, dd)
+
+    if line is not None and line in axis.lines:
+        line.set_data(pointsDisplay[:, 0], pointsDisplay[:, 1])
+        line.set_visible(True)
+        return line
 
-        axis.plot(pointDisplay[0], pointDisplay[1], marker=m, color=colour, markersize=15)
+    return axis.plot(pointsDisplay[:, 0], pointsDisplay[:, 1], marker=m, color=colour, markersize=15,
+                     linestyle='none')[0]
 
 
 def pixelsToDisplay(pointPix: list, fd: list, dd: list):
@@ -447,9 +630,28 @@ def pixelsToDisplay(pointPix: list, fd: list, dd: list):
     return pointDisplay
 
 
+def pixelsToDisplayArray(pointsPix, fd: list, dd: list) -> np.ndarray:
+    """
+    Convert an array of points from frame relative pixels to display coordinates, see pixelsToDisplay.
+
+    Args:
+        pointsPix: Points in frame relative coordinates, shape (N, 2).
+        fd: Frame dimensions.
+        dd: Display dimensions.
+
+    Returns:
+        Points in display coordinates as an (N, 2) array.
+    """
+    pointsPix = np.asarray(pointsPix, dtype=float).reshape(-1, 2)
+    pointsDisplay = np.round(pointsPix * [dd[0] / fd[1], dd[1] / fd[0]])
+
+    return pointsDisplay
+
+
 def displayToPixels(pointDisplay: list, fd: list, dd: list):
     """
-    Convert a point from display coordinates to frame relative pixel coordinates.
+    Convert a point from display coordinates to frame relative pixel coordinates. Points slightly outside the frame
+    (the axis limits extend past its edges) are clamped to the first or last pixel of the frame.
     Args:
         pointDisplay: Point in display coordinates.
         fd: Frame dimensions.
@@ -458,8 +660,9 @@ def displayToPixels(pointDisplay: list, fd: list, dd: list):
     Returns:
         Point in frame relative pixel coordinates.
     """
-    pointRatio = [pointDisplay[0] / dd[0], (pointDisplay[1]) / dd[1]]
-    pointPix = ratioToCoordinates(pointRatio, [fd[1], fd[0]])
+    # Called for every click and drag event, so the ratio is converted inline rather than through ratioToCoordinates.
+    pointPix = [min(round(max(pointDisplay[0], 0) / dd[0] * fd[1]), fd[1] - 1),
+                min(round(max(pointDisplay[1], 0) / dd[1] * fd[0]), fd[0] - 1)]
 
     return pointPix
 
@@ -494,10 +697,9 @@ def pointInRadius(centre: list, point: list, radius: int) -> bool:
     Returns:
         withinRadius (bool): True if within radius, else False.
     """
-    withinRadius = False
-
-    if (point[0] - centre[0]) ** 2 + (point[1] - centre[1]) ** 2 < radius ** 2:
-        withinRadius = True
+    # Squared distance against the squared radius, no square root needed.
+    dx, dy = point[0] - centre[0], point[1] - centre[1]
+    withinRadius = dx * dx + dy * dy < radius * radius
 
     return withinRadius
 
@@ -566,16 +768,19 @@ def quaternionsToAxisAngles(quaternions: list) -> list:
     Returns:
         axisAngles: List of axis angles (in degrees) relative to the first rotation (taken as 0 degrees).
     """
-    initialQ = Quaternion(quaternions[0])
-    axisAngles = []
-    # Get angle differences (as quaternion rotations).
-    for row in quaternions:
-        q = Quaternion(row)
-        r = initialQ * q.conjugate
+    # Quaternions as (w, x, y, z) columns, all differences are calculated at once.
+    q = np.asarray(quaternions, dtype=float).reshape(-1, 4)
+    w1, x1, y1, z1 = q[0]
+    w2, x2, y2, z2 = q.T
+    # Hamilton product of the initial quaternion and the conjugate of each quaternion.
+    rw = w1 * w2 + x1 * x2 + y1 * y2 + z1 * z2
+    rx = -w1 * x2 + x1 * w2 - y1 * z2 + z1 * y2
+    ry = -w1 * y2 + x1 * z2 + y1 * w2 - z1 * x2
+    rz = -w1 * z2 - x1 * y2 + y1 * x2 + z1 * w2
 
-        axisAngles.append(180 / np.pi * 2 * np.arctan2(np.sqrt(r[1] ** 2 + r[2] ** 2 + r[3] ** 2), r[0]))
+    axisAngles = 180 / np.pi * 2 * np.arctan2(np.sqrt(rx ** 2 + ry ** 2 + rz ** 2), rw)
 
-    return axisAngles
+    return axisAngles.tolist()
 
 
 def getBulletDataFromFile(scanPath: str):
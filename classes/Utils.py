@@ -11,10 +11,7 @@ from PyQt6.QtWidgets import QHBoxLayout, QLabel, QSpacerItem, QSizePolicy
 from matplotlib.patches import Polygon
 from scipy.interpolate import splprep, splev
 
-from classes.ErrorDialog import ErrorDialog
-
 labelFont = QFont('Arial', 14)
-spacer = QSpacerItem(1, 1, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Expanding)
 stylesheet = """QToolTip { background-color: black; 
                                    color: white; 
                                    border: black solid 1px }"""
@@ -34,9 +31,10 @@ def resetEditingData(scansPath: str):
     """
     # Get total patients.
     totalPatients = 0
-    for i in os.listdir(Path(scansPath)):
-        if os.path.isdir(Path(scansPath, i)):
-            totalPatients += 1
+    with os.scandir(Path(scansPath)) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                totalPatients += 1
     print(f'Total patients to reset: {totalPatients}')
 
     patients = natsort.natsorted(Path(scansPath).iterdir())
@@ -121,30 +119,18 @@ def shrinkExpandPoints(points: list, amount: int):
     Returns:
         points: Points after shrinking.
     """
+    points = np.asarray(points, dtype=float)
     # Find centre-of-mass of points.
     com = getCOM(points)
     # Shift points to centre-of-mass origin.
-    shiftedPoints = []
-    for point in points:
-        shiftedPoints.append([point[0] - com[0], point[1] - com[1]])
-    # Convert shifted points to polar coordinates.
-    polarPoints = []
-    for point in shiftedPoints:
-        polarPoints.append(cartesianToPolar(point))
-    # Shrink by amount.
-    shrinkPolarPoints = []
-    for point in polarPoints:
-        shrinkPolarPoints.append([point[0] + amount, point[1]])
-    # Convert shrink polar coordinates back to cartesian coordinates.
-    cartesianPoints = []
-    for point in shrinkPolarPoints:
-        cartesianPoints.append(polarToCartesian(point))
-    # Shift back to original position.
-    newPoints = []
-    for point in cartesianPoints:
-        newPoints.append([round(point[0] + com[0]), round(point[1] + com[1])])
+    shiftedPoints = points - com
+    # Convert shifted points to polar coordinates and shrink by amount.
+    rho = np.hypot(shiftedPoints[:, 0], shiftedPoints[:, 1]) + amount
+    phi = np.arctan2(shiftedPoints[:, 1], shiftedPoints[:, 0])
+    # Convert back to cartesian coordinates and shift back to original position.
+    newPoints = np.round(np.column_stack((rho * np.cos(phi), rho * np.sin(phi))) + com)
 
-    return newPoints
+    return newPoints.astype(int).tolist()
 
 
 def organiseClockwise(points: np.array):
@@ -192,6 +178,9 @@ def distributePoints(pointsPix, count):
 
     Return:
         Return all points, distributed evenly and in order.
+
+    Raises:
+        ValueError: If the points could not be interpolated, see interpolate.
     """
     # Sort points using wandering salesperson.
     pointsPix = sortPoints(pointsPix)
@@ -205,8 +194,6 @@ def distributePoints(pointsPix, count):
     xs, ys = poly.xy.T
     # Evenly space points along spline line.
     xn, yn = interpolate(xs, ys, len(xs) if len(xs) > count else count + 1)
-    if xn is None:
-        return
     # Get all points except the last one, which is a repeat.
     endPointsPix = np.column_stack([xn, yn])[:-1]
 
@@ -250,7 +237,11 @@ def sortPoints(points):
 
 def interpolate(x, y, total_points):
     """
-    Interpolate x and y using splprep and splev. Used by the Spline class.
+    Interpolate x and y using splprep and splev. Used by the Spline class. Failures are raised rather than shown in a
+    dialog as this also runs off the GUI thread during exports.
+
+    Raises:
+        ValueError: If the points could not be interpolated (too few, must be > 2).
     """
     try:
         [tck, _] = splprep([x, y], s=0, per=True)
@@ -259,35 +250,32 @@ def interpolate(x, y, total_points):
 
         return xi, yi
     except Exception as e:
-        ErrorDialog(None, 'Error interpolating points (too few, must be > 2).', e)
-        return None, None
+        raise ValueError('Error interpolating points (too few, must be > 2).') from e
 
 
 def createTitleLayout():
-    """Create title layout area."""
-    layout = QHBoxLayout()
+    """
+    Create title layout area.
 
-    patientLabel = QLabel(f'Patient: ')
-    patientLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-    patientLabel.setFont(labelFont)
-    typeLabel = QLabel(f'Type:')
-    typeLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-    typeLabel.setFont(labelFont)
-    planeLabel = QLabel(f'Plane:')
-    planeLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-    planeLabel.setFont(labelFont)
-    numberLabel = QLabel(f'Number:')
-    numberLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-    numberLabel.setFont(labelFont)
-    frameLabel = QLabel(f'Frames:')
-    frameLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
-    frameLabel.setFont(labelFont)
-
-    layout.addWidget(patientLabel, 0)
-    layout.addWidget(typeLabel, 0)
-    layout.addWidget(planeLabel, 0)
-    layout.addWidget(numberLabel, 0)
-    layout.addWidget(frameLabel, 0)
+    Returns:
+        layout: Title layout.
+        labels: Title labels keyed by 'patient', 'type', 'plane', 'number', and 'frames'.
+    """
+    layout = QHBoxLayout()
     layout.setSpacing(10)
 
-    return layout
+    labels = {}
+    for key, text in [('patient', 'Patient:'), ('type', 'Type:'), ('plane', 'Plane:'), ('number', 'Number:'),
+                      ('frames', 'Frames:')]:
+        label = QLabel(text)
+        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        label.setFont(labelFont)
+        layout.addWidget(label, 0)
+        labels[key] = label
+
+    return layout, labels
+
+
+def createSpacer():
+    """Create a vertically expanding spacer. Layouts take ownership of their items, so each needs its own."""
+    return QSpacerItem(1, 1, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Expanding)
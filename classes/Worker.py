@@ -0,0 +1,41 @@
+# Worker.py
+
+"""Run a long task (exports, resetting editing data) on a QThreadPool worker so the GUI remains responsive."""
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class WorkerSignals(QObject):
+    """
+    Signals emitted by a Worker. QRunnable is not a QObject, so the signals live here.
+
+    started: The task has started.
+    finished: Return value of the task.
+    error: Exception raised by the task.
+    """
+    started = pyqtSignal()
+    finished = pyqtSignal(object)
+    error = pyqtSignal(object)
+
+
+class Worker(QRunnable):
+    def __init__(self, task, *args):
+        """
+        Initialise a Worker that calls task(*args). Start it with QThreadPool.globalInstance().start(worker).
+
+        Args:
+            task: Callable to run. It must not create any widgets (dialogs) as it is not run on the GUI thread.
+            *args: Arguments passed to task.
+        """
+        super().__init__()
+        self.task = task
+        self.args = args
+        self.signals = WorkerSignals()
+
+    def run(self):
+        """Run the task, emitting its result or the exception raised."""
+        self.signals.started.emit()
+        try:
+            result = self.task(*self.args)
+            self.signals.finished.emit(result)
+        except Exception as e:
+            self.signals.error.emit(e)
@@ -4,20 +4,25 @@
 import multiprocessing
 import os
 import sys
+from functools import partial
+from pathlib import Path
 
-import qdarktheme
 from PyQt6 import QtGui
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QSize, QThreadPool, QTimer
 from PyQt6.QtGui import QAction, QIcon
 from PyQt6.QtWidgets import QMainWindow, QApplication, QFileDialog, QHBoxLayout, QWidget, QVBoxLayout, QPushButton, \
-    QCheckBox, QMenu, QInputDialog, QStyle, QMessageBox, QToolBar, QSpinBox, QRadioButton, QButtonGroup
+    QCheckBox, QMenu, QInputDialog, QStyle, QMessageBox, QToolBar, QSpinBox, QRadioButton, QButtonGroup, \
+    QProgressDialog
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 
 from classes import Export, Utils
 from classes import Scan
 from classes.ErrorDialog import ErrorDialog
 from classes.FrameCanvas import FrameCanvas
-from processes import PlayCine, AxisAnglePlot
+from classes.LoadingDialog import LoadingDialog
+from classes.ScanLoader import ScanLoader
+from classes.Worker import Worker
+from processes import AxisAnglePlot
 
 basedir = os.path.dirname(__file__)
 
@@ -37,22 +42,27 @@ class Main(QMainWindow):
         # Display 2 scans side-by-side inside central widget.
         self.mainWidget = QWidget(self)
         self.mainLayout = QHBoxLayout(self.mainWidget)
-        self.mainWidget.installEventFilter(self)
 
         # Menu load data.
         self.menuLoadData = []
+        # Load data actions per scan, stored as (scan path, Save Data mtime, {fileName: QAction}).
+        self._saveDataCache = {}
         # 2 vertical layouts.
         self.layouts = [QVBoxLayout(), QVBoxLayout()]
         # Left and Right Toolbars.
         self.toolbars = [self._createToolBars(i) for i in [0, 1]]
+        # Distribute points actions, triggered with the D key.
+        self.distributeActions = [self.toolbars[i].actions()[10] for i in [0, 1]]
         # Titles.
-        self.titles = [Utils.createTitleLayout() for _ in [0, 1]]
+        self.titles, self.titleLabels = zip(*[Utils.createTitleLayout() for _ in [0, 1]])
         # Buttons above canvas.
         self.buttons = [self._createTopButtons(i) for i in [0, 1]]
+        # Axis angle buttons, checked on key presses.
+        self.axisAngleButtons = [self.buttons[i].itemAt(3).widget() for i in [0, 1]]
         # Boxes below canvas.
         self.boxes = [self._createBottomBoxes(i) for i in [0, 1]]
         # Canvases for displaying frames.
-        self.canvases = [FrameCanvas(updateDisplay=lambda x=i: self._updateDisplay(x),
+        self.canvases = [FrameCanvas(updateDisplay=partial(self._updateDisplay, i),
                                      showProstatePointsCB=self.boxes[i].itemAt(0).widget(),
                                      showBladderPointsCB=self.boxes[i].itemAt(1).widget(),
                                      showProstateMaskCB=self.boxes[i].itemAt(2).widget(),
@@ -63,6 +73,14 @@ class Main(QMainWindow):
                                      bladderPointsCB=self.toolbars[i].actions()[1].defaultWidget(),
                                      prostateBoxCB=self.toolbars[i].actions()[2].defaultWidget(),
                                      bladderBoxCB=self.toolbars[i].actions()[3].defaultWidget()) for i in [0, 1]]
+        # Scan whose canvas is under the mouse (tracked with enter/leave events), for key presses and context menus.
+        self.activeScan = None
+        for i in [0, 1]:
+            self.canvases[i].mpl_connect('figure_enter_event', partial(self._onCanvasEnter, i))
+            self.canvases[i].mpl_connect('figure_leave_event', partial(self._onCanvasLeave, i))
+            # Show a box while it is being created.
+            self.canvases[i].prostateBoundingBox.clicked.connect(self.canvases[i].showProstateBox.setChecked)
+            self.canvases[i].bladderBoundingBox.clicked.connect(self.canvases[i].showBladderBox.setChecked)
         # Canvas navigation toolbars.
         self.navBars = [NavigationToolbar(self.canvases[i], self) for i in [0, 1]]
 
@@ -74,85 +92,122 @@ class Main(QMainWindow):
             self.layouts[i].addWidget(self.canvases[i])
             self.layouts[i].addWidget(self.navBars[i])
             self.layouts[i].addLayout(self.boxes[i])
-            self.layouts[i].addItem(Utils.spacer)
+            self.layouts[i].addItem(Utils.createSpacer())
         # Add left and right to mainLayout.
         self.mainLayout.addLayout(self.layouts[0])
         self.mainLayout.addLayout(self.layouts[1])
         self.setCentralWidget(self.mainWidget)
-        # Main menu.
-        self._createMainMenu()
 
         # Scan directory Path.
         self.scansPath = f'C:/Users/roryb/GDOffline/Research/Scans'
         # Scans.
         self.scans = [Scan.Scan(self) for _ in [0, 1]]
+        # Redraw requests are coalesced and drawn at most once per display refresh (~60 Hz). Maps scan to new flag.
+        self.pendingRedraws = {}
+        self.redrawTimer = QTimer(self)
+        self.redrawTimer.setSingleShot(True)
+        self.redrawTimer.setInterval(16)
+        self.redrawTimer.timeout.connect(self._redrawPendingScans)
+        # Background frame loaders and their progress dialogs.
+        self.scanLoaders = [None, None]
+        self.loadingDialogs = [None, None]
+        # Background export/reset workers, referenced until they finish.
+        self.workers = []
         # Class for exporting data for training.
         self.export = Export.Export(self.scansPath)
         # Processes.
         self.axisAngleProcess = [AxisAnglePlot.AxisAnglePlot() for _ in [0, 1]]
+        # Main menu (created after the scans and export objects its actions are bound to).
+        self._createMainMenu()
+        # Canvas right click menu, shared by both canvases. Actions are applied to contextMenuScan.
+        self.contextMenuScan = None
+        self.contextMenu = self._createContextMenu()
+
+        # Merge auto-repeated key presses (holding W/S) into a single event when events back up.
+        self.setAttribute(Qt.WidgetAttribute.WA_KeyCompression, True)
 
         self.showMaximized()
 
     def _createMainMenu(self):
         """Create menus."""
+        # Actions that are disabled until a scan is loaded, per scan and for either scan (patient navigation).
+        self.scanActions = [[], []]
+        self.patientActions = []
         # Load scans menu.
         self.menuLoadScans = self.menuBar().addMenu("Load Scans")
         for i in range(2):
-            self.menuLoadScans.addAction(f"Select Scan {i + 1} Folder...", lambda x=i: self._selectScanDialog(x))
-            self.menuLoadScans.addAction(f"Open Scan {i + 1} Directory...",
-                                         lambda x=i: self.scans[x].openDirectory()).setDisabled(True)
+            self.menuLoadScans.addAction(f"Select Scan {i + 1} Folder...", partial(self._selectScanDialog, i))
+            self.scanActions[i].append(self.menuLoadScans.addAction(f"Open Scan {i + 1} Directory...",
+                                                                    self.scans[i].openDirectory))
 
             self.menuLoadScans.addSeparator()
-        self.menuLoadScans.addAction('Load AUS Patient', lambda: self._selectAUSPatientDialog())
+        self.menuLoadScans.addAction('Load AUS Patient', self._selectAUSPatientDialog)
         self.menuLoadScans.addSeparator()
-        self.menuLoadScans.addAction('Load PUS Patient', lambda: self._selectPUSPatientDialog())
+        self.menuLoadScans.addAction('Load PUS Patient', self._selectPUSPatientDialog)
         # Load data menu
         menuLoadData = self.menuBar().addMenu("Load Data")
         self.menuLoadData.append(menuLoadData.addMenu('Load Scan 1 Data'))
         menuLoadData.addSeparator()
         self.menuLoadData.append(menuLoadData.addMenu('Load Scan 2 Data'))
         [self.menuLoadData[i].setDisabled(True) for i in [0, 1]]
-        [self.menuLoadData[i].aboutToShow.connect(lambda x=i: self._populateLoadScanData(x)) for i in [0, 1]]
+        [self.menuLoadData[i].aboutToShow.connect(partial(self._populateLoadScanData, i)) for i in [0, 1]]
         # Save data menu.
         self.menuSaveData = self.menuBar().addMenu("Save Data")
-        self.menuSaveData.addAction('Save Scan 1 Data', lambda: self._saveData([0])).setDisabled(True)
+        self.scanActions[0].append(self.menuSaveData.addAction('Save Scan 1 Data', partial(self._saveData, [0])))
         self.menuSaveData.addSeparator()
-        self.menuSaveData.addAction('Save Scan 2 Data', lambda: self._saveData([1])).setDisabled(True)
+        self.scanActions[1].append(self.menuSaveData.addAction('Save Scan 2 Data', partial(self._saveData, [1])))
         self.menuSaveData.addSeparator()
-        self.menuSaveData.addAction('Save Both', lambda: self._saveData([0, 1])).setDisabled(True)
-        # Export data menu.
+        self.saveBothAction = self.menuSaveData.addAction('Save Both', partial(self._saveData, [0, 1]))
+        self.saveBothAction.setDisabled(True)
+        # Export data menu. Lambdas are kept here, _runExport takes *args so a partial would also be given the checked
+        # argument of triggered.
         self.menuExport = self.menuBar().addMenu("Export Data")
         menuExportIPV = self.menuExport.addMenu('IPV')
-        menuExportIPV.addAction('Transverse', lambda: self.export.exportIPVAUSData(Scan.PLANE_TRANSVERSE, self))
-        menuExportIPV.addAction('Sagittal', lambda: self.export.exportIPVAUSData(Scan.PLANE_SAGITTAL, self))
+        menuExportIPV.addAction('Transverse',
+                                lambda: self._runExport(self.export.exportIPVAUSData, Scan.PLANE_TRANSVERSE, self))
+        menuExportIPV.addAction('Sagittal',
+                                lambda: self._runExport(self.export.exportIPVAUSData, Scan.PLANE_SAGITTAL, self))
         menuExportnnU = self.menuExport.addMenu('nnUNet')
-        menuExportnnU.addAction('Transverse', lambda: self.export.exportnnUNetAUSData(Scan.PLANE_TRANSVERSE))
-        menuExportnnU.addAction('Sagittal', lambda: self.export.exportnnUNetAUSData(Scan.PLANE_SAGITTAL))
+        menuExportnnU.addAction('Transverse',
+                                lambda: self._runExport(self.export.exportnnUNetAUSData, Scan.PLANE_TRANSVERSE))
+        menuExportnnU.addAction('Sagittal',
+                                lambda: self._runExport(self.export.exportnnUNetAUSData, Scan.PLANE_SAGITTAL))
         menuExportYOLO = self.menuExport.addMenu('YOLO')
-        menuExportYOLO.addAction('Transverse', lambda: self.export.exportYOLOAUSData(Scan.PLANE_TRANSVERSE))
-        menuExportYOLO.addAction('Sagittal', lambda: self.export.exportYOLOAUSData(Scan.PLANE_SAGITTAL))
+        menuExportYOLO.addAction('Transverse',
+                                 lambda: self._runExport(self.export.exportYOLOAUSData, Scan.PLANE_TRANSVERSE))
+        menuExportYOLO.addAction('Sagittal',
+                                 lambda: self._runExport(self.export.exportYOLOAUSData, Scan.PLANE_SAGITTAL))
         menuExportnnUNetYOLO = self.menuExport.addMenu('YOLO for nnUNet')
-        menuExportnnUNetYOLO.addAction('Transverse', lambda: self.export.exportYOLOfornnUNetAUS(Scan.PLANE_TRANSVERSE))
-        menuExportnnUNetYOLO.addAction('Sagittal', lambda: self.export.exportYOLOfornnUNetAUS(Scan.PLANE_SAGITTAL))
-        self.menuExport.addAction('Save Data', lambda: self.export.exportAllSaveData())
+        menuExportnnUNetYOLO.addAction('Transverse',
+                                       lambda: self._runExport(self.export.exportYOLOfornnUNetAUS,
+                                                               Scan.PLANE_TRANSVERSE))
+        menuExportnnUNetYOLO.addAction('Sagittal',
+                                       lambda: self._runExport(self.export.exportYOLOfornnUNetAUS, Scan.PLANE_SAGITTAL))
+        self.menuExport.addAction('Save Data', lambda: self._runExport(self.export.exportAllSaveData))
         self.menuExport.addSeparator()
-        self.menuExport.addAction('Open Export Directory', lambda: self.export.openExportDirectory(basedir))
+        self.menuExport.addAction('Open Export Directory', partial(self.export.openExportDirectory, basedir))
         # Reset data menu.
         self.menuReset = self.menuBar().addMenu("Reset Data")
-        self.menuReset = self.menuReset.addAction("Reset Editing Data", lambda: self._resetEditingData())
+        self.menuReset = self.menuReset.addAction("Reset Editing Data", self._resetEditingData)
         # Extra functions menu.
         self.menuExtras = self.menuBar().addMenu("Extras")
-        self.menuExtras.addAction('Bullet Scan 1', lambda: self.scans[0].printBulletDimensions()).setDisabled(True)
-        self.menuExtras.addAction('Bullet Scan 2', lambda: self.scans[1].printBulletDimensions()).setDisabled(True)
+        self.scanActions[0].append(
+            self.menuExtras.addAction('Bullet Scan 1', self.scans[0].printBulletDimensions))
+        self.scanActions[1].append(
+            self.menuExtras.addAction('Bullet Scan 2', self.scans[1].printBulletDimensions))
         self.menuExtras.addSeparator()
         menuExtrasNext = self.menuExtras.addMenu("Next")
-        menuExtrasNext.addAction(f'Scan 1', lambda: self._navigatePatients(0, Scan.NEXT)).setDisabled(True)
-        menuExtrasNext.addAction(f'Scan 2', lambda: self._navigatePatients(1, Scan.NEXT)).setDisabled(True)
-        menuExtrasNext.addAction(f'Patient', lambda: self._navigatePatients(-1, Scan.NEXT)).setDisabled(True)
+        self.scanActions[0].append(menuExtrasNext.addAction(f'Scan 1', partial(self._navigatePatients, 0, Scan.NEXT)))
+        self.scanActions[1].append(menuExtrasNext.addAction(f'Scan 2', partial(self._navigatePatients, 1, Scan.NEXT)))
+        self.patientActions.append(menuExtrasNext.addAction(f'Patient', partial(self._navigatePatients, -1, Scan.NEXT)))
         menuExtrasPrevious = self.menuExtras.addMenu("Previous")
-        menuExtrasPrevious.addAction(f'Scan 1', lambda: self._navigatePatients(0, Scan.PREVIOUS)).setDisabled(True)
-        menuExtrasPrevious.addAction(f'Scan 2', lambda: self._navigatePatients(1, Scan.PREVIOUS)).setDisabled(True)
-        menuExtrasPrevious.addAction(f'Patient', lambda: self._navigatePatients(-1, Scan.PREVIOUS)).setDisabled(True)
+        self.scanActions[0].append(
+            menuExtrasPrevious.addAction(f'Scan 1', partial(self._navigatePatients, 0, Scan.PREVIOUS)))
+        self.scanActions[1].append(
+            menuExtrasPrevious.addAction(f'Scan 2', partial(self._navigatePatients, 1, Scan.PREVIOUS)))
+        self.patientActions.append(
+            menuExtrasPrevious.addAction(f'Patient', partial(self._navigatePatients, -1, Scan.PREVIOUS)))
+        [action.setDisabled(True) for action in self.scanActions[0] + self.scanActions[1] + self.patientActions]
 
     def _createToolBars(self, scan):
         """Create left and right toolbars (mirrored)."""
@@ -171,12 +226,10 @@ class Main(QMainWindow):
 
         prostateBox = QRadioButton("Prostate\nBox")
         prostateBox.setToolTip("Create prostate bounding box.")
-        prostateBox.clicked.connect(lambda: self.boxes[scan].itemAt(4).widget().setChecked(prostateBox.isChecked()))
         toolbar.addWidget(prostateBox)
 
         bladderBox = QRadioButton("Bladder\nBox")
         bladderBox.setToolTip("Create bladder bounding box.")
-        bladderBox.clicked.connect(lambda: self.boxes[scan].itemAt(5).widget().setChecked(bladderBox.isChecked()))
         toolbar.addWidget(bladderBox)
 
         radioGroup = QButtonGroup()
@@ -186,11 +239,11 @@ class Main(QMainWindow):
         radioGroup.addButton(bladderBox)
 
         copyPrevious = QAction(QIcon(f"{basedir}/res/copy_previous.png"), "Copy previous frame points.", self)
-        copyPrevious.triggered.connect(lambda: self._copyFramePoints(scan, Scan.PREVIOUS))
+        copyPrevious.triggered.connect(partial(self._copyFramePoints, scan, Scan.PREVIOUS))
         toolbar.addAction(copyPrevious)
 
         copyNext = QAction(QIcon(f"{basedir}/res/copy_next.png"), "Copy points from next frame.", self)
-        copyNext.triggered.connect(lambda: self._copyFramePoints(scan, Scan.NEXT))
+        copyNext.triggered.connect(partial(self._copyFramePoints, scan, Scan.NEXT))
         toolbar.addAction(copyNext)
 
         shrinkPoints = QAction(QIcon(f"{basedir}/res/shrink.png"), "Shrink points around CoM.", self)
@@ -233,25 +286,25 @@ class Main(QMainWindow):
         cineButton = QPushButton('', self)
         cineButton.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
         cineButton.setToolTip('Play Cine of Scan')
-        cineButton.clicked.connect(lambda: self._onCineClicked(scan))
+        cineButton.clicked.connect(partial(self._onCineClicked, scan))
         cineButton.setDisabled(True)
         layout.addWidget(cineButton)
 
         nav50IMUButton = QPushButton('IMU Centre')
         nav50IMUButton.setToolTip('Show frame at 50% of sweep (based on IMU data).')
-        nav50IMUButton.clicked.connect(lambda: self._onNav50Clicked(scan, Scan.NAV_TYPE_IMU))
+        nav50IMUButton.clicked.connect(partial(self._onNav50Clicked, scan, Scan.NAV_TYPE_IMU))
         nav50IMUButton.setDisabled(True)
         layout.addWidget(nav50IMUButton)
 
         nav50TS1Button = QPushButton('TS1 Centre')
         nav50TS1Button.setToolTip('Show frame at 50% of prostate (based on TS1 data).')
-        nav50TS1Button.clicked.connect(lambda: self._onNav50Clicked(scan, Scan.NAV_TYPE_TS1))
+        nav50TS1Button.clicked.connect(partial(self._onNav50Clicked, scan, Scan.NAV_TYPE_TS1))
         nav50TS1Button.setDisabled(True)
         layout.addWidget(nav50TS1Button)
 
         axisAngleButton = QPushButton('Axis Angle Plot')
         axisAngleButton.setToolTip('Show axis angle plot.')
-        axisAngleButton.clicked.connect(lambda: self._onAxisAngleClicked(scan))
+        axisAngleButton.clicked.connect(partial(self._onAxisAngleClicked, scan))
         axisAngleButton.setDisabled(True)
         layout.addWidget(axisAngleButton)
 
@@ -264,37 +317,37 @@ class Main(QMainWindow):
 
         prostatePoints = QCheckBox('Show Prostate\nPoints')
         prostatePoints.setChecked(True)
-        prostatePoints.stateChanged.connect(lambda: self._updateDisplay(scan))
+        prostatePoints.stateChanged.connect(partial(self._updateDisplay, scan, False))
         prostatePoints.setDisabled(True)
         layout.addWidget(prostatePoints)
 
         bladderPoints = QCheckBox('Show Bladder\nPoints')
         bladderPoints.setChecked(True)
-        bladderPoints.stateChanged.connect(lambda: self._updateDisplay(scan))
+        bladderPoints.stateChanged.connect(partial(self._updateDisplay, scan, False))
         bladderPoints.setDisabled(True)
         layout.addWidget(bladderPoints)
 
         prostateMask = QCheckBox('Show Prostate\nMask')
         prostateMask.setChecked(False)
-        prostateMask.stateChanged.connect(lambda: self._updateDisplay(scan))
+        prostateMask.stateChanged.connect(partial(self._updateDisplay, scan, False))
         prostateMask.setDisabled(True)
         layout.addWidget(prostateMask)
 
         bladderMask = QCheckBox('Show Bladder\nMask')
         bladderMask.setChecked(False)
-        bladderMask.stateChanged.connect(lambda: self._updateDisplay(scan))
+        bladderMask.stateChanged.connect(partial(self._updateDisplay, scan, False))
         bladderMask.setDisabled(True)
         layout.addWidget(bladderMask)
 
         prostateBox = QCheckBox('Show Prostate\nBox')
         prostateBox.setChecked(False)
-        prostateBox.stateChanged.connect(lambda: self._updateDisplay(scan))
+        prostateBox.stateChanged.connect(partial(self._updateDisplay, scan, False))
         prostateBox.setDisabled(True)
         layout.addWidget(prostateBox)
 
         bladderBox = QCheckBox('Show Bladder\nBox')
         bladderBox.setChecked(False)
-        bladderBox.stateChanged.connect(lambda: self._updateDisplay(scan))
+        bladderBox.stateChanged.connect(partial(self._updateDisplay, scan, False))
         bladderBox.setDisabled(True)
         layout.addWidget(bladderBox)
 
@@ -302,9 +355,9 @@ class Main(QMainWindow):
 
     def _distributePoints(self, scan: int, count: int):
         """Distribute points along a generated spline."""
-        if self.toolbars[scan].actions()[0].defaultWidget().isChecked():
+        if self.canvases[scan].prostatePoints.isChecked():
             self.canvases[scan].distributeFramePoints(count, Scan.PROSTATE)
-        elif self.toolbars[scan].actions()[1].defaultWidget().isChecked():
+        elif self.canvases[scan].bladderPoints.isChecked():
             self.canvases[scan].distributeFramePoints(count, Scan.BLADDER)
         self._updateDisplay(scan)
 
@@ -321,18 +374,21 @@ class Main(QMainWindow):
         self._updateDisplay(scan)
 
     def _updateTitle(self, scan: int):
-        """Update title information."""
+        """Update title information, only called when a scan is loaded. Unchanged labels are not set again."""
         patient, scanType, scanPlane, scanNumber, scanFrames = self.scans[scan].getScanDetails()
-        self.titles[scan].itemAt(0).widget().setText(f'Patient: {patient}')
-        self.titles[scan].itemAt(1).widget().setText(f'Type: {scanType}')
-        self.titles[scan].itemAt(2).widget().setText(f'Plane: {scanPlane}')
-        self.titles[scan].itemAt(3).widget().setText(f'Number: {scanNumber}')
-        self.titles[scan].itemAt(4).widget().setText(f'Frames: {scanFrames}')
+        titles = {'patient': f'Patient: {patient}', 'type': f'Type: {scanType}', 'plane': f'Plane: {scanPlane}',
+                  'number': f'Number: {scanNumber}', 'frames': f'Frames: {scanFrames}'}
+        for key, text in titles.items():
+            if self.titleLabels[scan][key].text() != text:
+                self.titleLabels[scan][key].setText(text)
 
     def _onCineClicked(self, scan: int):
         """Play a cine of the scan in a separate window."""
         patient, scanType, scanPlane, _, _ = self.scans[scan].getScanDetails()
-        PlayCine.PlayCine(self.scans[scan].frames, patient, scanType, scanPlane)
+        # Imported here as pyqtgraph is only needed for the cine window.
+        from processes import PlayCine
+        shmName, shape, dtype = self.scans[scan].getSharedFramesDetails()
+        PlayCine.PlayCine(shmName, shape, dtype, patient, scanType, scanPlane)
 
     def _resetEditingData(self):
         """Reset all editing data after confirmation."""
@@ -340,12 +396,71 @@ class Main(QMainWindow):
                                        buttons=QMessageBox.StandardButton.Ok | QMessageBox.StandardButton.Cancel)
 
         if confirm == QMessageBox.StandardButton.Ok:
-            result = Utils.resetEditingData(self.scansPath)
-            text = 'Editing Data has been reset!' if result else 'An error occurred while resetting Editing Data!'
-            dialog = QMessageBox(parent=self, text=text)
-            dialog.setWindowTitle('Reset Editing Data')
-            dialog.exec()
-            [self._refreshScanData(i) for i in [0, 1]]
+            # Changes still waiting to be written are written now, so none can be written after the reset.
+            [scan.flush() for scan in self.scans]
+            self._runInBackground('Resetting Editing Data...', self._onEditingDataReset, Utils.resetEditingData,
+                                  self.scansPath)
+
+    def _onEditingDataReset(self, result: bool):
+        """Show the result of resetting the editing data and refresh the scans."""
+        text = 'Editing Data has been reset!' if result else 'An error occurred while resetting Editing Data!'
+        dialog = QMessageBox(parent=self, text=text)
+        dialog.setWindowTitle('Reset Editing Data')
+        dialog.exec()
+        [self._refreshScanData(i) for i in [0, 1]]
+
+    def _runExport(self, exportMethod, *args):
+        """
+        Run an Export method. Its settings dialogs are shown here, the export itself is run in the background.
+
+        Args:
+            exportMethod: Export method returning the export as a callable, or None if cancelled.
+            *args: Arguments passed to exportMethod.
+        """
+        job = exportMethod(*args)
+        if job:
+            # The export reads the data files, so changes still waiting to be written are written first.
+            [scan.flush() for scan in self.scans]
+            self._runInBackground('Exporting...', None, job)
+
+    def _runInBackground(self, message: str, onFinished, task, *args):
+        """
+        Run task(*args) on a QThreadPool worker with a loading dialog. Exporting and resetting are disabled until the
+        task has finished, as they work on the same directories.
+
+        Args:
+            message: Message shown in the loading dialog.
+            onFinished: Called with the result of the task on the GUI thread, can be None.
+            task: Callable to run, must not create any widgets.
+            *args: Arguments passed to task.
+        """
+        worker = Worker(task, *args)
+        loadingDialog = LoadingDialog(basedir, self, message)
+
+        def finish():
+            self.workers.remove(worker)
+            loadingDialog.stop()
+            loadingDialog.deleteLater()
+            self.menuExport.setEnabled(True)
+            self.menuReset.setEnabled(True)
+
+        def onSuccess(result):
+            finish()
+            if onFinished is not None:
+                onFinished(result)
+
+        def onError(e):
+            finish()
+            ErrorDialog(self, message.rstrip('.') + ' failed.', e)
+
+        worker.signals.finished.connect(onSuccess)
+        worker.signals.error.connect(onError)
+        self.menuExport.setEnabled(False)
+        self.menuReset.setEnabled(False)
+        loadingDialog.startNonBlocking()
+
+        self.workers.append(worker)
+        QThreadPool.globalInstance().start(worker)
 
     def _saveData(self, scans: list):
         """Save Scan point data. Check for overwrite"""
@@ -357,7 +472,7 @@ class Main(QMainWindow):
             if ok:
                 if not saveName:
                     ErrorDialog(self, 'User name is empty.', '')
-                    self._saveData(scan)
+                    self._saveData([scan])
                     return
                 self.scans[scan].checkSaveDataDirectory()
                 # "Overwrite" old save directories.
@@ -370,21 +485,53 @@ class Main(QMainWindow):
                     else:
                         return
                 self.scans[scan].saveUserData(saveName, scan)
+                self._invalidateSaveDataCache(scan)
 
     def _populateLoadScanData(self, scan: int):
-        """Populate the load submenu just before opening."""
-        self.menuLoadData[scan].clear()
-        actions = []
-        for fileName in self.scans[scan].getSaveData():
-            action = QAction(fileName.split('_')[0], self)
-            action.triggered.connect(lambda _, x=fileName: self._loadSaveData(scan, x))
-            actions.append(action)
-        self.menuLoadData[scan].addActions(actions)
+        """
+        Populate the load submenu just before opening. The submenu is only updated when the Save Data directory has
+        changed since the last opening, and then only the added/removed save folders are updated.
+        """
+        menu = self.menuLoadData[scan]
+        scanPath = self.scans[scan].path
+        try:
+            mtime = Path(scanPath, 'Save Data').stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        cachedPath, cachedMtime, actions = self._saveDataCache.get(scan, (None, None, {}))
+        if cachedPath == scanPath and cachedMtime == mtime:
+            return
+        fileNames = self.scans[scan].getSaveData() if mtime is not None else []
+        # If a different scan has been loaded none of the old actions are valid.
+        staleNames = set(actions) - set(fileNames) if cachedPath == scanPath else set(actions)
+        for fileName in staleNames:
+            action = actions.pop(fileName)
+            menu.removeAction(action)
+            action.deleteLater()
+        # New actions are inserted before the next existing action, so the menu keeps the order of getSaveData.
+        nextAction = None
+        for fileName in reversed(fileNames):
+            if fileName not in actions:
+                action = QAction(fileName.split('_')[0], self)
+                action.triggered.connect(partial(self._loadSaveData, scan, fileName))
+                menu.insertAction(nextAction, action)
+                actions[fileName] = action
+            nextAction = actions[fileName]
+        self._saveDataCache[scan] = (scanPath, mtime, actions)
+
+    def _invalidateSaveDataCache(self, scan: int):
+        """
+        Force the load submenu to be checked against the Save Data directory on its next opening. The directory mtime
+        alone can miss a save made within the file system's timestamp resolution (e.g. an overwrite on FAT drives).
+        """
+        if scan in self._saveDataCache:
+            scanPath, _, actions = self._saveDataCache[scan]
+            self._saveDataCache[scan] = (scanPath, None, actions)
 
     def _loadSaveData(self, scan: int, fileName: str):
-        """Load save data of scan and update display."""
+        """Load save data of scan (updating the scan in place) and update display."""
         self.scans[scan].loadSaveData(fileName)
-        self._refreshScanData(scan)
+        self._updateDisplay(scan)
 
     def _navigatePatients(self, scan: int, direction: str):
         """Load previous or next patient."""
@@ -437,45 +584,129 @@ class Main(QMainWindow):
         self._loadScan(scan, scanPath)
 
     def _loadScan(self, scan: int, scanPath: str):
-        """Load a scan."""
+        """Load the frames of a scan in the background, the scan is shown in _onScanLoaded."""
+        if self.scanLoaders[scan] is not None:
+            self.scanLoaders[scan].abort()
+            self._closeLoadingDialog(scan)
+
+        loader = ScanLoader(scanPath, self.centralWidget().size().width())
+        dialog = QProgressDialog(f'Loading Scan {scan + 1}...', 'Cancel', 0, 100, self)
+        dialog.setWindowTitle('Loading Scan')
+        dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        # Show the dialog (blocking further clicks) almost immediately rather than after the default 4 s.
+        dialog.setMinimumDuration(200)
+        dialog.canceled.connect(loader.abort)
+        loader.signals.progress.connect(dialog.setValue)
+        loader.signals.finished.connect(partial(self._onScanLoaded, scan, loader, scanPath))
+        loader.signals.error.connect(partial(self._onScanLoadError, scan, loader))
+        self.scanLoaders[scan] = loader
+        self.loadingDialogs[scan] = dialog
+        # The shown scan is about to be replaced, so it cannot be edited while the new one is loading.
+        self.canvases[scan].setEnabled(False)
+
+        QThreadPool.globalInstance().start(loader)
+
+    def _closeLoadingDialog(self, scan: int):
+        """Close the progress dialog of a scan loader and forget the loader."""
+        if self.loadingDialogs[scan] is not None:
+            self.loadingDialogs[scan].canceled.disconnect()
+            self.loadingDialogs[scan].close()
+            self.loadingDialogs[scan].deleteLater()
+        self.scanLoaders[scan] = None
+        self.loadingDialogs[scan] = None
+        self.canvases[scan].setEnabled(True)
+
+    def _onScanLoadError(self, scan: int, loader: ScanLoader, e: Exception):
+        """Show the error raised by a scan loader, unless it has since been replaced."""
+        if loader is not self.scanLoaders[scan]:
+            return
+        self._closeLoadingDialog(scan)
+        ErrorDialog(self, 'Error loading Scan data.', e)
+
+    def _onScanLoaded(self, scan: int, loader: ScanLoader, scanPath: str, frames: list):
+        """Finish loading a scan once its frames have been loaded, then enable the UI and display it."""
+        if loader is not self.scanLoaders[scan]:
+            frames = None
+            loader.releaseFrames()
+            return
+        self._closeLoadingDialog(scan)
+        # Loading was cancelled.
+        if frames is None:
+            return
         try:
-            self.scans[scan].load(scanPath)
-            self.toolbars[scan].setEnabled(True)
-            self.navBars[scan].setMaximumWidth(self.scans[scan].displayDimensions[0])
+            # The scan takes ownership of the shared memory block holding the frames.
+            framesShm, loader.framesShm = loader.framesShm, None
+            self.scans[scan].load(scanPath, frames=frames, framesShm=framesShm, displayFrames=loader.displayFrames,
+                                  imuData=loader.imuData)
             self.canvases[scan].linkedScan = self.scans[scan]
-            for i in range(self.buttons[scan].count()):
-                self.buttons[scan].itemAt(i).widget().setEnabled(True)
-            self.layouts[scan].itemAt(2).widget().setFixedSize(self.scans[scan].displayDimensions[0],
-                                                               self.scans[scan].displayDimensions[1])
-            for i in range(self.boxes[scan].count()):
-                self.boxes[scan].itemAt(i).widget().setEnabled(True)
-
-            self.menuLoadData[scan].setEnabled(True)
-            self.menuLoadScans.actions()[1 if scan == 0 else 4].setEnabled(True)
-            self.menuSaveData.actions()[0 if scan == 0 else 2].setEnabled(True)
-            self.menuSaveData.actions()[4].setEnabled(True) if self.scans[0].loaded and self.scans[1].loaded else \
-                self.menuSaveData.actions()[4].setDisabled(True)
-            self.menuExtras.actions()[scan].setEnabled(True)
-            self.menuExtras.menuInAction(self.menuExtras.actions()[3]).actions()[scan].setEnabled(True)
-            self.menuExtras.menuInAction(self.menuExtras.actions()[3]).actions()[2].setEnabled(True)
-            self.menuExtras.menuInAction(self.menuExtras.actions()[4]).actions()[scan].setEnabled(True)
-            self.menuExtras.menuInAction(self.menuExtras.actions()[4]).actions()[2].setEnabled(True)
-
-            self._updateTitle(scan)
+            # Resizing, enabling, and retitling are painted once, when updates are enabled again.
+            self.mainWidget.setUpdatesEnabled(False)
+            try:
+                self._resizeCanvas(scan)
+                self._enableScanUI(scan)
+                self._updateTitle(scan)
+            finally:
+                self.mainWidget.setUpdatesEnabled(True)
             self._updateDisplay(scan, new=True)
         except Exception as e:
             ErrorDialog(self, 'Error loading Scan data.', e)
 
+    def _resizeCanvas(self, scan: int):
+        """
+        Fix the canvas size to the display dimensions, so frames (already resized to the display dimensions) are drawn
+        without being resampled. Successive scans usually share dimensions, then the layout is left untouched.
+        """
+        width, height = self.scans[scan].displayDimensions
+        canvas = self.canvases[scan]
+        if canvas.minimumSize() == canvas.maximumSize() == QSize(width, height) and \
+                self.navBars[scan].maximumWidth() == width:
+            return
+        self.navBars[scan].setMaximumWidth(width)
+        canvas.setFixedSize(width, height)
+
+    def _enableScanUI(self, scan: int):
+        """Enable the toolbar, buttons, boxes, and menu actions of a loaded scan."""
+        self.toolbars[scan].setEnabled(True)
+        for layout in [self.buttons[scan], self.boxes[scan]]:
+            for i in range(layout.count()):
+                layout.itemAt(i).widget().setEnabled(True)
+        self.menuLoadData[scan].setEnabled(True)
+        for action in self.scanActions[scan] + self.patientActions:
+            action.setEnabled(True)
+        self.saveBothAction.setEnabled(self.scans[0].loaded and self.scans[1].loaded)
+
     def _updateDisplay(self, scan: int, new=False):
-        """Update the shown frame and position on plot."""
-        self.canvases[scan].updateAxis(new)
-        self.axisAngleProcess[scan].updateIndex(self.scans[scan].currentFrame - 1)
+        """
+        Request an update of the shown frame and position on plot. If no redraw has happened within the last timer
+        interval the scan is redrawn immediately, otherwise the request waits for the timer so bursts of requests
+        (held navigation keys) result in at most one redraw per interval. New frames always wait for the timer, giving
+        the resized canvas a chance to be laid out first.
+        """
+        self.pendingRedraws[scan] = self.pendingRedraws.get(scan, False) or new
+        if not self.redrawTimer.isActive():
+            if new:
+                self.redrawTimer.start()
+            else:
+                self._redrawPendingScans()
+
+    def _redrawPendingScans(self):
+        """Update the shown frame and position on plot of all scans with pending redraw requests."""
+        pendingRedraws, self.pendingRedraws = self.pendingRedraws, {}
+        if pendingRedraws:
+            # Any further requests within the interval are held back until the timer fires.
+            self.redrawTimer.start()
+        for scan, new in pendingRedraws.items():
+            self.canvases[scan].updateAxis(new)
+            self.axisAngleProcess[scan].updateIndex(self.scans[scan].currentFrame - 1)
+            # Resize the neighbouring frames in the background so the next navigation is a cache hit.
+            if not self.scans[scan].displayFramesPrefetched():
+                QThreadPool.globalInstance().start(self.scans[scan].prefetchDisplayFrames)
 
     def _shrinkExpandPoints(self, scan: int, amount):
         """Expand or shrink points around centre of mass."""
-        if self.toolbars[scan].actions()[0].defaultWidget().isChecked():
+        if self.canvases[scan].prostatePoints.isChecked():
             self.scans[scan].shrinkExpandPoints(amount, Scan.PROSTATE)
-        elif self.toolbars[scan].actions()[1].defaultWidget().isChecked():
+        elif self.canvases[scan].bladderPoints.isChecked():
             self.scans[scan].shrinkExpandPoints(amount, Scan.BLADDER)
         self._updateDisplay(scan)
 
@@ -501,60 +732,105 @@ class Main(QMainWindow):
 
     def _copyFramePoints(self, scan: int, location):
         """Copy points from either previous or next frame."""
-        if self.toolbars[scan].actions()[0].defaultWidget().isChecked():
+        if self.canvases[scan].prostatePoints.isChecked():
             self.scans[scan].copyFramePoints(location, Scan.PROSTATE)
-        elif self.toolbars[scan].actions()[1].defaultWidget().isChecked():
+        elif self.canvases[scan].bladderPoints.isChecked():
             self.scans[scan].copyFramePoints(location, Scan.BLADDER)
         self._updateDisplay(scan)
 
     def _refreshScanData(self, scan: int):
         """Refresh scan data by re-reading files."""
         if self.scans[scan].loaded:
-            self.scans[scan].load(self.scans[scan].path, self.scans[scan].currentFrame)
+            self.scans[scan].reload()
             self._updateDisplay(scan)
 
+    def closeEvent(self, event: QtGui.QCloseEvent) -> None:
+        """Release the shared memory holding the frames of both scans before closing."""
+        self.redrawTimer.stop()
+        self.pendingRedraws = {}
+        for i in [0, 1]:
+            if self.scanLoaders[i] is not None:
+                self.scanLoaders[i].abort()
+            self.scans[i].flush()
+            self.scans[i].releaseFrames()
+        super().closeEvent(event)
+
+    def _onCanvasEnter(self, scan: int, _):
+        """The mouse has entered the canvas of scan."""
+        self.activeScan = scan
+
+    def _onCanvasLeave(self, scan: int, _):
+        """The mouse has left the canvas of scan."""
+        if self.activeScan == scan:
+            self.activeScan = None
+
+    def _getHoveredScan(self):
+        """Return the scan whose canvas is under the mouse if it is loaded and can be edited, else None."""
+        scan = self.activeScan
+        if scan is not None and self.scans[scan].loaded and self.canvases[scan].isEnabled():
+            return scan
+        return None
+
     def keyPressEvent(self, event: QtGui.QKeyEvent) -> None:
-        """Handle key press events."""
-        if self.scans[0].loaded and self.canvases[0].underMouse():
-            if event.key() == Qt.Key.Key_W:
-                self.scans[0].navigate(Scan.NAVIGATION['w'])
-            elif event.key() == Qt.Key.Key_S:
-                self.scans[0].navigate(Scan.NAVIGATION['s'])
-            elif event.key() == Qt.Key.Key_N:
-                self._navigatePatients(-1, Scan.NEXT)
-            elif self.buttons[0].itemAt(3).widget().isChecked() and event.key() == Qt.Key.Key_D:
-                self.toolbars[0].actions()[10].trigger()
-            self._updateDisplay(0)
-
-        elif self.scans[1].loaded and self.canvases[1].underMouse():
-            if event.key() == Qt.Key.Key_W:
-                self.scans[1].navigate(Scan.NAVIGATION['w'])
-            elif event.key() == Qt.Key.Key_S:
-                self.scans[1].navigate(Scan.NAVIGATION['s'])
-            elif event.key() == Qt.Key.Key_N:
+        """Handle key press events, only the keys below are handled and only when a loaded scan is hovered."""
+        key = event.key()
+        i = self._getHoveredScan() if key in (Qt.Key.Key_W, Qt.Key.Key_S, Qt.Key.Key_N, Qt.Key.Key_D) else None
+        if i is not None:
+            if key == Qt.Key.Key_W:
+                self._navigate(i, Scan.NAVIGATION['w'], event.count())
+            elif key == Qt.Key.Key_S:
+                self._navigate(i, Scan.NAVIGATION['s'], event.count())
+            elif key == Qt.Key.Key_N:
                 self._navigatePatients(-1, Scan.NEXT)
-            elif self.buttons[1].itemAt(3).widget().isChecked() and event.key() == Qt.Key.Key_D:
-                self.toolbars[1].actions()[10].trigger()
-            self._updateDisplay(1)
+            elif self.axisAngleButtons[i].isChecked() and key == Qt.Key.Key_D:
+                self.distributeActions[i].trigger()
+                self._updateDisplay(i)
+            else:
+                return super().keyPressEvent(event)
+            event.accept()
+            return
+        super().keyPressEvent(event)
 
-    def contextMenuEvent(self, event):
-        for i in [0, 1]:
-            if self.scans[i].loaded and self.canvases[i].underMouse():
-                menu = QMenu()
-                menuPoints = menu.addMenu('Clear')
-                menuPoints.addAction('Clear Frame Prostate Points',
-                                     lambda: self._clearFramePoints(i, Scan.PROSTATE))
-                menuPoints.addAction('Clear Frame Prostate Box',
-                                     lambda: self._clearFrameBox(i, Scan.PROSTATE))
-                menuPoints.addAction('Clear Frame Bladder Points',
-                                     lambda: self._clearFramePoints(i, Scan.BLADDER))
-                menuPoints.addAction('Clear Frame Bladder Box',
-                                     lambda: self._clearFrameBox(i, Scan.BLADDER))
+    def _navigate(self, scan: int, navCommand, steps=1):
+        """Navigate through the frames of a scan, steps > 1 when key repeats have been compressed into one event."""
+        for _ in range(max(steps, 1)):
+            self.scans[scan].navigate(navCommand)
+        self._updateDisplay(scan)
+
+    def _createContextMenu(self):
+        """
+        Create the right click menu of the canvases, created once and shared. Each action holds the method (and its
+        arguments after scan) it calls as data, the scan is set when the menu is opened.
+        """
+        menu = QMenu(self)
+        menuPoints = menu.addMenu('Clear')
+        for text, data in [('Clear Frame Prostate Points', (self._clearFramePoints, Scan.PROSTATE)),
+                           ('Clear Frame Prostate Box', (self._clearFrameBox, Scan.PROSTATE)),
+                           ('Clear Frame Bladder Points', (self._clearFramePoints, Scan.BLADDER)),
+                           ('Clear Frame Bladder Box', (self._clearFrameBox, Scan.BLADDER)),
+                           (None, None),
+                           ('Clear All Points', (self._clearScanPoints,)),
+                           ('Clear All Boxes', (self._clearScanBoxes,))]:
+            if text is None:
                 menuPoints.addSeparator()
-                menuPoints.addAction('Clear All Points', lambda: self._clearScanPoints(i))
-                menuPoints.addAction('Clear All Boxes', lambda: self._clearScanBoxes(i))
-                menu.addAction('Refresh Scan Data', lambda: self._refreshScanData(i))
-                menu.exec(event.globalPos())
+                continue
+            menuPoints.addAction(text).setData(data)
+        menu.addAction('Refresh Scan Data').setData((self._refreshScanData,))
+        # Triggered actions of submenus are also emitted by their parent menu.
+        menu.triggered.connect(self._onContextMenuTriggered)
+
+        return menu
+
+    def _onContextMenuTriggered(self, action: QAction):
+        """Call the method of the triggered context menu action on the scan the menu was opened for."""
+        method, *args = action.data()
+        method(self.contextMenuScan, *args)
+
+    def contextMenuEvent(self, event):
+        i = self._getHoveredScan()
+        if i is not None:
+            self.contextMenuScan = i
+            self.contextMenu.exec(event.globalPos())
 
 
 def except_hook(cls, exception, traceback):
@@ -565,6 +841,9 @@ if __name__ == "__main__":
     multiprocessing.freeze_support()
     sys.excepthook = except_hook
     # main()
+    # Only needed when run as the main script, not when a child process (PlayCine, AxisAnglePlot) imports this module.
+    import qdarktheme
+
     qdarktheme.enable_hi_dpi()
     editingApp = QApplication([])
 
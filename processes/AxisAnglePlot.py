@@ -29,19 +29,27 @@ class AxisAnglePlot:
         Initialise a ProcessAnglePlot object.
         """
         self.async_process = None
-        self.manager = MyManager()
-        self.manager.start()
+        # The manager spawns a server process, so it is only started when a plot is first shown.
+        self.manager = None
         self.queue = None
         self.pool = None
+        # Last index put on the queue, each put is a round trip to the manager process.
+        self.lastIndex = None
 
     def start(self, scan: Scan):
         """
         Create the queue object, processing pool, and start the plottingProcess running in the process pool.
         """
+        if self.manager is None:
+            self.manager = MyManager()
+            self.manager.start()
         self.queue = self.manager.LifoQueue()
+        self.lastIndex = scan.currentFrame - 1
         self.pool = multiprocessing.Pool(1)
-
-        self.async_process = self.pool.apply_async(plottingProcess, args=(self.queue, scan.path, scan.currentFrame - 1))
+        # The axis angles are taken from the loaded Scan, so the process does not load the Scan (and its frames) again.
+        self.async_process = self.pool.apply_async(plottingProcess, args=(self.queue, scan.quaternionsToAxisAngles(),
+                                                                          scan.getScanDetails(),
+                                                                          scan.currentFrame - 1))
 
     def updateIndex(self, index: int):
         """
@@ -50,7 +58,8 @@ class AxisAnglePlot:
         Args:
             index (int): Index of quaternion to be focused on (current frame quaternion).
         """
-        if self.queue:
+        if self.queue and index != self.lastIndex:
+            self.lastIndex = index
             self.queue.put(index)
 
     def end(self):
@@ -63,19 +72,17 @@ class AxisAnglePlot:
         self.pool.join()
 
 
-def plottingProcess(lifoQueue, scanPath: str, frameIndex: int):
+def plottingProcess(lifoQueue, axisAngles: list, scanDetails: tuple, frameIndex: int):
     """
     Method to be run in an async_process pool for plotting the points of a recording.
 
     Args:
         frameIndex: Current frame index.
-        scanPath: Path to Scan object.
+        axisAngles: Axis angles of the Scan (see Scan.quaternionsToAxisAngles).
+        scanDetails: Details of the Scan (see Scan.getScanDetails).
         lifoQueue (LifoQueue): MyManager queue object operating with LIFO principle.
     """
-    scan = Scan.Scan()
-    scan.load(scanPath)
-    axisAngles = scan.quaternionsToAxisAngles()
-    patient, scanType, scanPlane, scanNumber, _ = scan.getScanDetails()
+    patient, scanType, scanPlane, scanNumber, _ = scanDetails
 
     fig, ax = plt.subplots(1)
     fig.canvas.manager.set_window_title(f'Axis Angle Plot')
@@ -89,31 +96,32 @@ def plottingProcess(lifoQueue, scanPath: str, frameIndex: int):
 
     ax.plot(range(1, len(axisAngles) + 1), axisAngles, c='blue')
 
-    # 2 lines that show current location and some text, they are removed before first drawing and thus must exist.
-    ax.plot([], [])
-    ax.plot([], [])
-    ax.text(0, 0, '')
+    # 'Crosshair' and text label showing the current location, updated in place when the frame index changes.
+    circle = ax.plot([], [], marker='o', markersize=15, color='r', fillstyle='none', alpha=0.5)[0]
+    cross = ax.plot([], [], marker='+', markersize=15, color='r', alpha=0.5)[0]
+    label = ax.text(0, 0, '')
+    shownIndex = None
     while plt.fignum_exists(fig.number):
         try:
-            # Remove text label from previous point.
-            ax.texts[0].remove()
-            # Remove 'crosshair' from previous point.
-            # ax.lines[0].remove()
-            ax.lines[2].remove()
-            ax.lines[1].remove()
-
-            angle = axisAngles[frameIndex]
-            indexMax = len(axisAngles)
-            # Plot 'crosshair' for current point.
-            ax.plot(frameIndex + 1, angle, marker='o', markersize=15, color='r', fillstyle='none', alpha=0.5)
-            ax.plot(frameIndex + 1, angle, marker='+', markersize=15, color='r', alpha=0.5)
-            # Add text label for current point, change rotation based on where 'crosshair' is placed.
-            if frameIndex < indexMax / 6:
-                ax.text(frameIndex + 1, angle + 3, f'[{frameIndex + 1}, {angle:0.1f}]', rotation=90)
-            elif indexMax / 6 <= frameIndex <= 4 * indexMax / 6:
-                ax.text(frameIndex + 6, angle - .5, f'[{frameIndex + 1}, {angle:0.1f}]')
-            else:
-                ax.text(frameIndex - 2, angle - 9.5, f'[{frameIndex + 1}, {angle:0.1f}]', rotation=-90)
+            # Only touch the artists when the index changes, plt.pause redraws the figure only if it is stale.
+            if frameIndex != shownIndex:
+                shownIndex = frameIndex
+                angle = axisAngles[frameIndex]
+                indexMax = len(axisAngles)
+                # Move 'crosshair' to current point.
+                circle.set_data([frameIndex + 1], [angle])
+                cross.set_data([frameIndex + 1], [angle])
+                # Move text label to current point, change rotation based on where 'crosshair' is placed.
+                label.set_text(f'[{frameIndex + 1}, {angle:0.1f}]')
+                if frameIndex < indexMax / 6:
+                    label.set_position((frameIndex + 1, angle + 3))
+                    label.set_rotation(90)
+                elif indexMax / 6 <= frameIndex <= 4 * indexMax / 6:
+                    label.set_position((frameIndex + 6, angle - .5))
+                    label.set_rotation(0)
+                else:
+                    label.set_position((frameIndex - 2, angle - 9.5))
+                    label.set_rotation(-90)
 
             plt.pause(0.05)
 
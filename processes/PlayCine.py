@@ -2,11 +2,9 @@
 """Play a Cine of the given Scan."""
 import multiprocessing
 import sys
-import time
+from multiprocessing import shared_memory
 
 import numpy as np
-import pyqtgraph as pg
-import qdarktheme
 from PyQt6.QtCore import QTimer, Qt
 from PyQt6.QtGui import QFont
 from PyQt6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QApplication, QSlider, QLabel
@@ -17,10 +15,8 @@ from classes.ErrorDialog import ErrorDialog
 class Window(QMainWindow):
     def __init__(self, frames: np.ndarray, dimensions: list, patient: str, scanType: str, scanPlane: str):
         super().__init__()
-        # Flip frames to match MainWindow axis display.
-        self.frames = []
-        for frame in frames:
-            self.frames.append(np.flipud(frame))
+        # Flip frames to match MainWindow axis display, a single view of the shared frames (nothing is copied).
+        self.frames = frames[:, ::-1]
 
         self.dimensions = dimensions
         # Create heading above Cine.
@@ -30,6 +26,9 @@ class Window(QMainWindow):
         self._createUI()
 
     def _createUI(self):
+        # Imported here so the main process does not import pyqtgraph when starting the cine process.
+        import pyqtgraph as pg
+
         widget = QWidget(self)
 
         titleLabel = QLabel(self.title)
@@ -57,18 +56,18 @@ class Window(QMainWindow):
         def updateFrame():
             # Display the data
             self.img.setImage(self.frames[self.i].T)
-            # Creating a qtimer to call this updateFrame again.
-            QTimer.singleShot(1, updateFrame)
             # Automatically cycle through all frames.
             self.i += 1
             if self.i >= len(self.frames):
                 self.i = 0
-            # Delay function based on slider value.
-            sleepTime = slider.value()
-            time.sleep(1 / sleepTime)
+            # Delay based on slider value, the timer waits in the event loop rather than sleeping in it.
+            timer.setInterval(int(1000 / slider.value()))
 
-        # Call the update method
+        # Call the update method on a timer.
+        timer = QTimer(self)
+        timer.timeout.connect(updateFrame)
         updateFrame()
+        timer.start()
 
         # Creating and fill the layout.
         layout = QVBoxLayout(self)
@@ -83,15 +82,18 @@ class Window(QMainWindow):
 
 
 class PlayCine:
-    def __init__(self, frames: np.ndarray, patient: str, scanType: str, scanPlane: str):
+    def __init__(self, shmName: str, shape: tuple, dtype: str, patient: str, scanType: str, scanPlane: str):
         """
-        Initialise a PlayCine object.
+        Initialise a PlayCine object. The frames are not passed directly, only the details of the shared memory
+        block that holds them (see Scan.getSharedFramesDetails), so they are not pickled to the child process.
         """
         self.async_process = None
         self.queue = None
         self.pool = None
-        self.dimensions = [frames[0].shape[1], frames[0].shape[0]]
-        self.frames = frames
+        self.dimensions = [shape[2], shape[1]]
+        self.shmName = shmName
+        self.shape = shape
+        self.dtype = dtype
         self.patient = patient
         self.scanType = scanType
         self.scanPlane = scanPlane
@@ -103,17 +105,23 @@ class PlayCine:
         Start the process that will display the frames on a loop.
         """
         self.pool = multiprocessing.Pool(1)
-        self.async_process = self.pool.apply_async(process, args=(self.frames, self.dimensions,
-                                                                  self.patient, self.scanType,
+        self.async_process = self.pool.apply_async(process, args=(self.shmName, self.shape, self.dtype,
+                                                                  self.dimensions, self.patient, self.scanType,
                                                                   self.scanPlane))
 
 
-def process(frames: np.ndarray, dimensions: list, patient: str, scanType: str, scanPlane: str):
+def process(shmName: str, shape: tuple, dtype: str, dimensions: list, patient: str, scanType: str, scanPlane: str):
     try:
+        import qdarktheme
+
         App = QApplication(sys.argv)
 
         qdarktheme.setup_theme()
 
+        # Attach to the frames held in shared memory by the main process.
+        shm = shared_memory.SharedMemory(name=shmName)
+        frames = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
         window = Window(frames, dimensions, patient, scanType, scanPlane)
         window.show()
 